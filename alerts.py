@@ -0,0 +1,113 @@
+# In-cab alert playback.
+#
+# Sounds are decoded into memory once at start-up and played from a dedicated
+# thread, so a trigger never waits on disk I/O or WAV decoding. Repeated
+# triggers escalate (louder, repeated, then an added high tone) without
+# reloading anything. Trigger-to-playback latency is measured for every alert.
+#
+# Headless (CI, servers): SDL_AUDIODRIVER=dummy, see tests/test_alerts.py
+import time
+import array
+import math
+import queue
+import threading
+from collections import deque
+import pygame
+
+ALERT_WAV = "alert.wav"
+# (volume, extra loops, add tone) per escalation level
+ESCALATION = (
+    (0.6, 0, False),
+    (1.0, 1, False),
+    (1.0, 2, True),
+)
+ESCALATION_WINDOW = 30.0  # triggers closer together than this escalate
+TONE_HZ = 2000
+
+def make_tone(hz, seconds, volume=0.8):
+    # square-ish beep synthesised in the mixer's own format, no file needed
+    frequency, size, channels = pygame.mixer.get_init()
+    peak = int((2 ** (abs(size) - 1) - 1) * volume)
+    n = int(frequency * seconds)
+    samples = array.array("h", (peak if math.sin(2 * math.pi * hz * i / frequency) >= 0 else -peak
+                                for i in range(n) for _ in range(channels)))
+    return pygame.mixer.Sound(buffer=samples.tobytes())
+
+class AlertPlayer:
+    def __init__(self, path=ALERT_WAV, frequency=44100, buffer=512, window=256):
+        # a small mixer buffer is most of the output latency: 512 frames @ 44.1 kHz ~ 12 ms
+        pygame.mixer.pre_init(frequency, -16, 2, buffer)
+        pygame.mixer.init()
+        self.buffer_seconds = buffer / pygame.mixer.get_init()[0]
+        self.sound = pygame.mixer.Sound(path)
+        self.tone = make_tone(TONE_HZ, 0.25)
+        pygame.mixer.set_reserved(2)
+        self.channel = pygame.mixer.Channel(0)
+        self.tone_channel = pygame.mixer.Channel(1)
+
+        self.level = 0
+        self._last_trigger = None
+        self._queue = queue.Queue()
+        self.latencies = deque(maxlen=window)
+        self.played = 0
+        self.silenced = 0
+        self._thread = threading.Thread(target=self._run, name="alert-player", daemon=True)
+        self._thread.start()
+
+    def trigger(self, level=None):
+        # non-blocking; safe to call from the inference thread
+        now = time.perf_counter()
+        if level is None:
+            if self._last_trigger is not None and now - self._last_trigger < ESCALATION_WINDOW:
+                self.level = min(self.level + 1, len(ESCALATION) - 1)
+            else:
+                self.level = 0
+            level = self.level
+        self._last_trigger = now
+        self._queue.put((now, level))
+
+    def silence(self):
+        # the driver recovered: cut the alarm now; a new trigger within the
+        # escalation window still escalates
+        self._queue.put((time.perf_counter(), None))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            triggered, level = item
+            if level is None:
+                self.channel.stop()
+                self.tone_channel.stop()
+                self.silenced += 1
+                continue
+            volume, loops, tone = ESCALATION[level]
+            self.channel.set_volume(volume)
+            self.channel.play(self.sound, loops=loops)
+            if tone:
+                self.tone_channel.play(self.tone, loops=loops)
+            self.latencies.append(time.perf_counter() - triggered)
+            self.played += 1
+
+    def stats(self):
+        values = sorted(self.latencies)
+        pct = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3) if values else 0.0
+        return {
+            "played": self.played,
+            "silenced": self.silenced,
+            "level": self.level,
+            "dispatch_p50_ms": pct(0.5),
+            "dispatch_p95_ms": pct(0.95),
+            "dispatch_max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+            # samples still have to drain through the mixer buffer
+            "buffer_ms": round(self.buffer_seconds * 1000, 2),
+        }
+
+    def stop(self):
+        if not self._thread.is_alive():
+            return  # already stopped
+        self._queue.put(None)
+        self._thread.join(2.0)
+        pygame.mixer.stop()
+        pygame.mixer.quit()
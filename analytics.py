@@ -0,0 +1,161 @@
+import time
+import sqlite3
+import argparse
+from collections import Counter
+
+# Fleet-wide event counts, pre-aggregated per (driver_id, event_type, bucket)
+# at hourly and daily resolution. insert_events() keeps them current, so the
+# analytics endpoint never scans raw events. Buckets are epoch // seconds,
+# i.e. aligned to UTC hours and days.
+
+GRANULARITIES = {
+    "hour": ("rollup_hourly", 60 * 60),
+    "day": ("rollup_daily", 24 * 60 * 60),
+}
+GROUP_BY = ("event_type", "driver_id")
+
+# ---------------- SCHEMA ---------------- #
+
+def init_analytics_tables(conn):
+    c = conn.cursor()
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='rollup_daily'"
+    ).fetchone()
+    for table, _ in GRANULARITIES.values():
+        c.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table}(
+                driver_id INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                n INTEGER NOT NULL,
+                PRIMARY KEY (driver_id, event_type, bucket)
+            ) WITHOUT ROWID;
+        """)
+        # fleet-wide queries filter on time first
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table}(bucket, event_type)")
+    if not exists:
+        rebuild_rollups(conn)
+
+# ---------------- INCREMENTAL UPDATE ---------------- #
+
+def record_events(conn, rows):
+    # rows are (driver_id, event_type, ts, image_path, ts_epoch) tuples
+    c = conn.cursor()
+    for table, seconds in GRANULARITIES.values():
+        counts = Counter(
+            (row[0], row[1], int(row[4] // seconds)) for row in rows if row[4] is not None
+        )
+        c.executemany(
+            f"""INSERT INTO {table}(driver_id, event_type, bucket, n) VALUES (?, ?, ?, ?)
+                ON CONFLICT(driver_id, event_type, bucket) DO UPDATE SET n = n + excluded.n""",
+            [key + (n,) for key, n in counts.items()]
+        )
+
+def rebuild_rollups(conn):
+    c = conn.cursor()
+    for table, seconds in GRANULARITIES.values():
+        c.execute(f"DELETE FROM {table}")
+        c.execute(f"""
+            INSERT INTO {table}(driver_id, event_type, bucket, n)
+            SELECT driver_id, event_type, ts_epoch / {seconds}, COUNT(*)
+            FROM events
+            WHERE ts_epoch IS NOT NULL AND driver_id IS NOT NULL AND event_type IS NOT NULL
+            GROUP BY 1, 2, 3
+        """)
+
+# ---------------- QUERIES ---------------- #
+
+def bucket_range(seconds, since, until):
+    return int(since // seconds), int(-(-until // seconds))
+
+def top_granularity(since, until):
+    # coarse windows read the daily table, short ones the hourly table
+    return "day" if until - since >= 3 * 24 * 60 * 60 else "hour"
+
+def aligned_window(granularity, since, until):
+    # [since, until) widened to whole buckets: the window the counts cover
+    seconds = GRANULARITIES[granularity][1]
+    lo, hi = bucket_range(seconds, since, until)
+    return lo * seconds, hi * seconds
+
+def top_drivers(conn, since, until, limit=10, event_types=None, granularity=None):
+    if granularity is None:
+        granularity = top_granularity(since, until)
+    table, seconds = GRANULARITIES[granularity]
+    lo, hi = bucket_range(seconds, since, until)
+
+    where, params = ["r.bucket >= ?", "r.bucket < ?"], [lo, hi]
+    if event_types:
+        where.append("r.event_type IN (%s)" % ",".join("?" * len(event_types)))
+        params.extend(event_types)
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT r.driver_id, d.name, SUM(r.n) AS total
+        FROM {table} r LEFT JOIN drivers d ON d.id = r.driver_id
+        WHERE {" AND ".join(where)}
+        GROUP BY r.driver_id
+        ORDER BY total DESC, r.driver_id
+        LIMIT ?
+    """, params + [limit])
+    top = [{"driver_id": r[0], "name": r[1], "total": r[2], "by_type": {}} for r in c.fetchall()]
+    if not top:
+        return top
+
+    by_id = {d["driver_id"]: d for d in top}
+    c.execute(f"""
+        SELECT r.driver_id, r.event_type, SUM(r.n)
+        FROM {table} r
+        WHERE {" AND ".join(where)} AND r.driver_id IN ({",".join("?" * len(by_id))})
+        GROUP BY r.driver_id, r.event_type
+    """, params + list(by_id))
+    for driver_id, event_type, n in c.fetchall():
+        by_id[driver_id]["by_type"][event_type] = n
+    return top
+
+def timeseries(conn, since, until, granularity="hour", driver_id=None, event_types=None, group_by=None):
+    if group_by is not None and group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+    table, seconds = GRANULARITIES[granularity]
+    lo, hi = bucket_range(seconds, since, until)
+
+    where, params = ["bucket >= ?", "bucket < ?"], [lo, hi]
+    if driver_id is not None:
+        where.append("driver_id = ?")
+        params.append(driver_id)
+    if event_types:
+        where.append("event_type IN (%s)" % ",".join("?" * len(event_types)))
+        params.extend(event_types)
+    key = group_by
+    select = f"bucket, {key}" if key else "bucket"
+
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT {select}, SUM(n) FROM {table}
+        WHERE {" AND ".join(where)}
+        GROUP BY {select}
+        ORDER BY bucket
+    """, params)
+    points = []
+    for row in c.fetchall():
+        point = {"bucket_start": row[0] * seconds, "n": row[-1]}
+        if key:
+            point[key] = row[1]
+        points.append(point)
+    return points
+
+# ---------------- CLI ---------------- #
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the hourly/daily event rollups from the events table.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--db", default="drivers.db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    started = time.perf_counter()
+    init_analytics_tables(conn)
+    rebuild_rollups(conn)
+    conn.commit()
+    rows = conn.execute("SELECT COUNT(*) FROM rollup_hourly").fetchone()[0]
+    conn.close()
+    print(f"Rebuilt {rows} hourly rollup rows in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+import threading
+from collections import deque, Counter
+
+log = logging.getLogger(__name__)
+
+class BatcherBusy(Exception):
+    pass
+
+class _Request:
+    __slots__ = ("tensor", "enqueued", "done", "score", "batch_size", "queue_seconds", "error")
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.score = None
+        self.batch_size = 0
+        self.queue_seconds = 0.0
+        self.error = None
+
+class MicroBatcher:
+    # Dynamic request batching in front of one warm classifier per process.
+    # Request threads preprocess their own frame and call predict(); a single
+    # inference thread takes whatever is queued, waits at most `max_wait`
+    # after the oldest request for more to arrive (up to `max_batch`), runs
+    # one forward pass and hands every caller its own score.
+
+    def __init__(self, loader, max_batch=16, max_wait=0.005, max_queue=256, window=2048):
+        self.loader = loader
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+
+        self.classifier = None
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.queue_latencies = deque(maxlen=window)
+        self.inference_latencies = deque(maxlen=window)
+
+    def _ensure_started(self):
+        # load after fork: each gunicorn worker owns its model and thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._load_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            started = time.perf_counter()
+            self.classifier = self.loader()
+            self.warm()
+            log.info("classifier loaded in %.1fs", time.perf_counter() - started)
+            self._pending.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="classify-batcher", daemon=True)
+            self._thread.start()
+
+    def warm(self):
+        # one dummy pass per batch shape we expect (TFLite pads to powers of
+        # two), so the first caller does not pay for tracing / allocation
+        import numpy as np
+        h, w = self.classifier.input_size
+        sizes = {1 << i for i in range(self.max_batch.bit_length())} | {self.max_batch}
+        for n in sorted(sizes):
+            self.classifier.predict(np.zeros((n, h, w, 3), dtype=np.float32))
+
+    def preprocess(self, image):
+        self._ensure_started()
+        return self.classifier.preprocess(image)
+
+    def predict(self, image, timeout=10.0):
+        tensor = self.preprocess(image)
+        req = _Request(tensor)
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                raise BatcherBusy(f"classify queue full ({len(self._pending)}/{self.max_queue})")
+            self._pending.append(req)
+            self.requests += 1
+            self._cond.notify()
+        if not req.done.wait(timeout):
+            raise TimeoutError("classification timed out")
+        if req.error is not None:
+            raise req.error
+        return req
+
+    def _take(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0].enqueued + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(len(self._pending), self.max_batch)
+            return [self._pending.popleft() for _ in range(n)]
+
+    def _run(self):
+        import numpy as np
+        while True:
+            batch = self._take()
+            started = time.perf_counter()
+            try:
+                scores = self.classifier.drowsy_scores(np.stack([r.tensor for r in batch]))
+            except Exception as e:
+                log.exception("batch of %d failed", len(batch))
+                self.errors += len(batch)
+                for r in batch:
+                    r.error = e
+                    r.done.set()
+                continue
+            elapsed = time.perf_counter() - started
+            self.batches += 1
+            self.batch_sizes[len(batch)] += 1
+            self.inference_latencies.append(elapsed)
+            for r, score in zip(batch, scores):
+                r.score = float(score)
+                r.batch_size = len(batch)
+                r.queue_seconds = started - r.enqueued
+                self.queue_latencies.append(r.queue_seconds)
+                r.done.set()
+
+    def depth(self):
+        return len(self._pending)
+
+    def stats(self):
+        def pct(values, q):
+            values = sorted(values)
+            return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2) if values else 0.0
+        served = sum(n * count for n, count in self.batch_sizes.items())
+        return {
+            "loaded": self.classifier is not None,
+            "depth": self.depth(),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "batches": self.batches,
+            "avg_batch_size": round(served / self.batches, 2) if self.batches else 0.0,
+            "batch_sizes": {str(n): count for n, count in sorted(self.batch_sizes.items())},
+            "queue_ms": {"p50": pct(self.queue_latencies, 0.5), "p95": pct(self.queue_latencies, 0.95),
+                         "p99": pct(self.queue_latencies, 0.99)},
+            "inference_ms": {"p50": pct(self.inference_latencies, 0.5), "p95": pct(self.inference_latencies, 0.95)},
+        }
+
+def decode_image(stream):
+    # JPEG/PNG bytes -> uint8 RGB array
+    import numpy as np
+    from PIL import Image
+    with Image.open(stream) as img:
+        return np.asarray(img.convert("RGB"))
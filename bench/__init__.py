@@ -0,0 +1,5 @@
+# Synthetic fleets and repeatable web-tier benchmarks.
+#
+#   python -m bench.fleet --out bench_data --drivers 10000 --events 50000000
+#   python -m bench.run --data bench_data --out baseline.json
+#   python -m bench.run --data bench_data --gunicorn 4 --out after.json --compare baseline.json
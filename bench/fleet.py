@@ -0,0 +1,157 @@
+# Generates a synthetic fleet into a fresh directory laid out like the app's
+# working directory (drivers.db + records/), so main.py can be pointed at it
+# unchanged. Timestamps are bursty: a few badly rested drivers produce most
+# alerts, alerts cluster in episodes a few seconds apart (like the bundled
+# drivers.db), and episodes are more frequent at night.
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENT_TYPES = (("drowsiness", 0.45), ("yawning", 0.55))
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+CHUNK = 100000
+
+def init_schema(workdir):
+    # the app creates its own schema (and later the indexes and aggregates)
+    sys.path.insert(0, ROOT)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main
+        main.init_db()
+        main.pool.close_all()
+    finally:
+        os.chdir(cwd)
+    return main
+
+def driver_weights(rng, drivers):
+    # heavy-tailed alert rate per driver
+    weights = [rng.paretovariate(1.3) for _ in range(drivers)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+def episode_start(rng, now, days):
+    # night hours (22:00-05:00) are three times as likely
+    while True:
+        t = now - rng.random() * days * 86400
+        hour = time.localtime(t).tm_hour
+        if hour >= 22 or hour < 5 or rng.random() < 1 / 3:
+            return t
+
+def generate_events(rng, driver_id, n, now, days):
+    while n > 0:
+        t = episode_start(rng, now, days)
+        kind = "drowsiness" if rng.random() < EVENT_TYPES[0][1] else "yawning"
+        burst = min(n, 1 + int(rng.expovariate(1 / 3)))
+        for _ in range(burst):
+            epoch = int(t)
+            yield (driver_id, kind, time.strftime(TS_FORMAT, time.localtime(epoch)), epoch)
+            t += rng.uniform(2, 5)
+        n -= burst
+
+def snapshot_sources(source_dir):
+    found = []
+    for root, _, files in os.walk(source_dir):
+        found.extend(os.path.join(root, f) for f in files if f.lower().endswith((".jpg", ".jpeg")))
+    return sorted(found)
+
+def synthetic_jpeg(path, rng):
+    from PIL import Image
+    Image.effect_noise((640, 480), 32 + rng.random() * 64).convert("RGB").save(path, "JPEG", quality=85)
+
+def place_snapshot(sources, i, dest, rng):
+    # hard links keep a large fleet cheap on disk; served bytes are identical
+    if not sources:
+        synthetic_jpeg(dest, rng)
+        return
+    src = sources[i % len(sources)]
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+def generate(workdir, drivers=1000, events=1000000, snapshots=2000, days=90, seed=1,
+             snapshot_source=os.path.join(ROOT, "records"), log=print):
+    if os.path.exists(os.path.join(workdir, "drivers.db")):
+        raise SystemExit(f"{workdir}/drivers.db exists; generate into a fresh directory")
+    os.makedirs(os.path.join(workdir, "records"), exist_ok=True)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    main = init_schema(workdir)
+
+    conn = sqlite3.connect(os.path.join(workdir, "drivers.db"))
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    # bulk load without secondary indexes; init_db() recreates them afterwards
+    index_names = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='events' AND sql IS NOT NULL")]
+    for name in index_names:
+        conn.execute(f"DROP INDEX {name}")
+    conn.executemany(
+        "INSERT INTO drivers(name, license_number, email) VALUES (?, ?, ?)",
+        ((f"driver{i}", f"L{i:07d}", f"driver{i}@fleet.example") for i in range(1, drivers + 1))
+    )
+
+    sources = snapshot_sources(snapshot_source) if snapshot_source else []
+    snapshot_every = max(1, events // snapshots) if snapshots else 0
+    now = time.time()
+    weights = driver_weights(rng, drivers)
+    counts = [int(w * events) for w in weights]
+    counts[0] += events - sum(counts)
+
+    batch, written, placed = [], 0, 0
+    for driver_id, n in enumerate(counts, start=1):
+        for driver, kind, ts, epoch in generate_events(rng, driver_id, n, now, days):
+            image_path = None
+            if snapshot_every and written % snapshot_every == 0 and placed < snapshots:
+                folder = os.path.join(workdir, "records", str(driver))
+                os.makedirs(folder, exist_ok=True)
+                name = f"event_{epoch}_{written}.jpg"
+                place_snapshot(sources, placed, os.path.join(folder, name), rng)
+                image_path = f"records/{driver}/{name}"
+                placed += 1
+            batch.append((driver, kind, ts, image_path, epoch))
+            written += 1
+            if len(batch) >= CHUNK:
+                conn.executemany(
+                    "INSERT INTO events(driver_id, event_type, ts, image_path, ts_epoch) VALUES (?,?,?,?,?)", batch)
+                conn.commit()
+                batch.clear()
+                log(f"  {written}/{events} events, {written / (time.perf_counter() - started):.0f}/s")
+    conn.executemany(
+        "INSERT INTO events(driver_id, event_type, ts, image_path, ts_epoch) VALUES (?,?,?,?,?)", batch)
+    conn.commit()
+
+    log("  indexing and building aggregates")
+    main.scores.rebuild_scores(conn)
+    main.analytics.rebuild_rollups(conn)
+    conn.commit()
+    conn.close()
+    init_schema(workdir)  # recreates the dropped indexes
+
+    manifest = {"drivers": drivers, "events": written, "snapshots": placed, "days": days, "seed": seed,
+                "generated_at": int(time.time()), "seconds": round(time.perf_counter() - started, 1)}
+    with open(os.path.join(workdir, "fleet.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic fleet (drivers.db + records/) for benchmarks.")
+    parser.add_argument("--out", default="bench_data")
+    parser.add_argument("--drivers", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--snapshots", type=int, default=2000, help="snapshot files to create")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--snapshot-source", default=os.path.join(ROOT, "records"),
+                        help="JPEGs to hard-link as snapshots ('' = synthesise with Pillow)")
+    args = parser.parse_args()
+
+    m = generate(args.out, args.drivers, args.events, args.snapshots, args.days, args.seed, args.snapshot_source)
+    print(f"✅ {m['drivers']} drivers, {m['events']} events, {m['snapshots']} snapshots in {m['seconds']}s -> {args.out}")
@@ -0,0 +1,269 @@
+# Drives the web tier against a synthetic fleet (see bench/fleet.py) and
+# writes a JSON baseline: throughput and p50/p95/p99 latency per scenario.
+#
+#   python -m bench.run --data bench_data --out baseline.json                 # Flask test client, in-process
+#   python -m bench.run --data bench_data --gunicorn 4 --out after.json      # spawns a local gunicorn
+#   python -m bench.run --data bench_data --url http://127.0.0.1:8000        # an already running server
+#   python -m bench.run --compare baseline.json after.json                   # diff two baselines
+#
+# The test client runs the app in this process, so concurrency is GIL-bound;
+# it measures per-request cost. Use --gunicorn/--url for throughput.
+import os
+import sys
+import json
+import time
+import random
+import socket
+import platform
+import argparse
+import itertools
+import threading
+import subprocess
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("api_event", "dashboard", "passenger", "records")
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# ---------------- CLIENTS ---------------- #
+
+class TestClient:
+    # one Flask test client (own cookie jar) per benchmark thread
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def login(self, license_number):
+        self.client.post("/login", data={"license_number": license_number})
+
+    def request(self, method, path, json_body=None, form=None):
+        r = self.client.open(path, method=method, json=json_body, data=form)
+        r.get_data()
+        return r.status_code
+
+class HttpClient:
+    def __init__(self, base):
+        self.base = base.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def login(self, license_number):
+        self.request("POST", "/login", form={"license_number": license_number})
+
+    def request(self, method, path, json_body=None, form=None):
+        data, headers = None, {}
+        if json_body is not None:
+            data, headers = json.dumps(json_body).encode(), {"Content-Type": "application/json"}
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as r:
+                r.read()
+                return r.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+# ---------------- SCENARIOS ---------------- #
+
+class Fleet:
+    def __init__(self, data_dir):
+        import sqlite3
+        conn = sqlite3.connect(os.path.join(data_dir, "drivers.db"))
+        self.licenses = [r[0] for r in conn.execute("SELECT license_number FROM drivers")]
+        self.driver_ids = [r[0] for r in conn.execute("SELECT id FROM drivers")]
+        self.snapshots = [r[0].replace("\\", "/") for r in conn.execute(
+            "SELECT image_path FROM events WHERE image_path IS NOT NULL ORDER BY RANDOM() LIMIT 2000")]
+        conn.close()
+        manifest = os.path.join(data_dir, "fleet.json")
+        self.manifest = json.load(open(manifest)) if os.path.exists(manifest) else {}
+
+def scenario_request(name, client, fleet, rng):
+    if name == "api_event":
+        return client.request("POST", "/api/event", json_body={
+            "driver_id": rng.choice(fleet.driver_ids),
+            "event_type": rng.choice(("drowsiness", "yawning")),
+            "ts": time.strftime(TS_FORMAT),
+            "image_path": None,
+        })
+    if name == "dashboard":
+        return client.request("GET", "/dashboard")
+    if name == "passenger":
+        return client.request("POST", "/passenger", form={"driver_id": str(rng.choice(fleet.driver_ids))})
+    if name == "records":
+        return client.request("GET", "/" + rng.choice(fleet.snapshots))
+    raise ValueError(name)
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def run_scenario(name, make_client, fleet, requests, concurrency, seed):
+    local = threading.local()
+    thread_seq = itertools.count()
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def one(i):
+        if not hasattr(local, "client"):
+            local.client = make_client()
+            local.rng = random.Random(seed * 1000 + next(thread_seq))
+            if name == "dashboard":
+                local.client.login(local.rng.choice(fleet.licenses))
+        started = time.perf_counter()
+        try:
+            status = scenario_request(name, local.client, fleet, local.rng)
+        except OSError:
+            status = 0
+        elapsed = time.perf_counter() - started
+        with lock:
+            if 200 <= status < 400:
+                latencies.append(elapsed)
+            else:
+                errors[0] += 1
+
+    if name == "records" and not fleet.snapshots:
+        return None
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(sum(latencies) * 1000 / len(latencies), 2) if latencies else 0.0,
+    }
+
+# ---------------- TARGETS ---------------- #
+
+def load_app(data_dir):
+    # main.py resolves drivers.db / records/ relative to the working directory
+    sys.path.insert(0, ROOT)
+    os.chdir(data_dir)
+    import main
+    main.init_db()
+    return main.app
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_gunicorn(data_dir, workers, threads):
+    port = free_port()
+    proc = subprocess.Popen([
+        sys.executable, "-m", "gunicorn", "main:app", "-w", str(workers), "-k", "gthread",
+        "--threads", str(threads), "-b", f"127.0.0.1:{port}", "--chdir", os.path.abspath(data_dir),
+        "--pythonpath", ROOT, "--log-level", "warning",
+    ])
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + "/metrics", timeout=1).read()
+            return proc, url
+        except OSError:
+            if proc.poll() is not None:
+                raise SystemExit("gunicorn exited during start-up")
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("gunicorn did not come up within 60s")
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ---------------- COMPARE ---------------- #
+
+def compare(old, new, threshold):
+    # -> list of regressions (p95 or throughput worse than threshold %)
+    regressions = []
+    print(f"{'scenario':<12}{'metric':<16}{'before':>10}{'after':>10}{'change':>9}")
+    for name, after in new["results"].items():
+        before = old["results"].get(name)
+        if not before or not after:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            a, b = before[metric], after[metric]
+            change = (b - a) / a * 100 if a else 0.0
+            worse = change < -threshold if metric == "throughput_rps" else change > threshold
+            flag = "  ⚠️" if worse else ""
+            print(f"{name:<12}{metric:<16}{a:>10}{b:>10}{change:>+8.1f}%{flag}")
+            if worse and metric in ("throughput_rps", "p95_ms"):
+                regressions.append((name, metric, change))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /api/event, /dashboard, /passenger and /records/.")
+    parser.add_argument("--data", default="bench_data", help="fleet directory from bench.fleet")
+    parser.add_argument("--url", help="benchmark a running server instead of the test client")
+    parser.add_argument("--gunicorn", type=int, metavar="WORKERS", help="spawn gunicorn with this many workers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON baseline here")
+    parser.add_argument("--compare", nargs="+", metavar="BASELINE",
+                        help="one file: compare this run against it; two files: just diff them")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold, percent")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        old, new = (json.load(open(p)) for p in args.compare)
+        sys.exit(1 if compare(old, new, args.threshold) else 0)
+
+    data_dir = os.path.abspath(args.data)
+    out = os.path.abspath(args.out) if args.out else None
+    baseline = os.path.abspath(args.compare[0]) if args.compare else None
+    fleet = Fleet(data_dir)
+    proc = None
+    if args.gunicorn:
+        proc, url = start_gunicorn(data_dir, args.gunicorn, args.threads)
+        make_client, target = (lambda: HttpClient(url)), f"gunicorn -w {args.gunicorn} --threads {args.threads}"
+    elif args.url:
+        make_client, target = (lambda: HttpClient(args.url)), args.url
+    else:
+        app = load_app(data_dir)
+        make_client, target = (lambda: TestClient(app)), "flask test client"
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime(TS_FORMAT),
+            "target": target,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "fleet": fleet.manifest,
+        },
+        "results": {},
+    }
+    try:
+        for name in args.scenarios.split(","):
+            print(f"⏱️  {name} ({args.requests} requests, concurrency {args.concurrency})")
+            result = run_scenario(name, make_client, fleet, args.requests, args.concurrency, args.seed)
+            report["results"][name] = result
+            if result:
+                print(f"    {result['throughput_rps']} req/s  p50 {result['p50_ms']} ms  "
+                      f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  errors {result['errors']}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📈 Baseline written to {out}")
+    if baseline:
+        sys.exit(1 if compare(json.load(open(baseline)), report, args.threshold) else 0)
@@ -0,0 +1,74 @@
+# Load test for /api/classify: throughput and latency vs. client concurrency.
+#
+#   CLASSIFY_MODEL=exports/model_int8.tflite gunicorn -w 1 --threads 64 main:app
+#   python bench_classify.py --url http://localhost:8000 --image frame.jpg --levels 1,2,4,8,16,32
+#
+# Each level sends --requests frames from that many threads. The average batch
+# size is read back from /api/classify/stats, so the table shows how the
+# micro-batcher turns concurrency into bigger batches and higher throughput.
+import io
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+def synthetic_jpeg(size=(640, 480)):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.effect_noise(size, 64).convert("RGB").save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+def run_level(url, payload, concurrency, total):
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def one(_):
+        started = time.perf_counter()
+        r = session.post(url + "/api/classify", data=payload, headers={"Content-Type": "image/jpeg"})
+        return time.perf_counter() - started, r.status_code
+
+    before = session.get(url + "/api/classify/stats").json()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    after = session.get(url + "/api/classify/stats").json()
+
+    latencies = sorted(t for t, status in results if status == 200)
+    batches = after["batches"] - before["batches"]
+    served = (after["requests"] - after["errors"]) - (before["requests"] - before["errors"])
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "failed": total - len(latencies),
+        "req_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(pct(0.5), 1),
+        "p95_ms": round(pct(0.95), 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "avg_batch": round(served / batches, 2) if batches else 0.0,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput scaling of /api/classify with client concurrency.")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--image", help="JPEG to send (default: synthetic 640x480 frame)")
+    parser.add_argument("--levels", default="1,2,4,8,16,32")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            payload = f.read()
+    else:
+        payload = synthetic_jpeg()
+
+    # first request loads and warms the model in the worker
+    requests.post(args.url + "/api/classify", data=payload, headers={"Content-Type": "image/jpeg"}).raise_for_status()
+
+    print(f"{'conc':>5}{'ok':>7}{'fail':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'avg batch':>11}")
+    for level in (int(x) for x in args.levels.split(",")):
+        r = run_level(args.url, payload, level, args.requests)
+        print(f"{r['concurrency']:>5}{r['ok']:>7}{r['failed']:>6}{r['req_per_sec']:>9}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['avg_batch']:>11}")
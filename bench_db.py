@@ -0,0 +1,85 @@
+# Reader/writer load test for the SQLite layer, before and after pooling.
+#
+#   python bench_db.py --writers 4 --readers 4 --seconds 10
+#
+# Each worker is a separate process, like a gunicorn worker. Writers run the
+# /api/event insert + commit, readers run the dashboard query. "baseline"
+# opens a fresh connection per operation with the default rollback journal
+# (the old db()); "pooled" goes through db_pool.ConnectionPool (WAL + pragmas).
+import os
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing as mp
+
+import db_pool
+
+INSERT_SQL = "INSERT INTO events(driver_id, event_type, ts, image_path) VALUES (?,?,?,?)"
+READ_SQL = "SELECT * FROM events WHERE driver_id=? ORDER BY id DESC LIMIT 50"
+
+def baseline_conn(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def worker(mode, role, path, seconds, worker_id, results):
+    pool = db_pool.ConnectionPool(path) if mode == "pooled" else None
+    get_conn = pool.acquire if pool else (lambda: baseline_conn(path))
+    ops = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        driver_id = 1 + (ops + worker_id) % 16
+        try:
+            conn = get_conn()
+            if role == "writer":
+                conn.execute(INSERT_SQL, (driver_id, "drowsiness", time.strftime("%Y-%m-%d %H:%M:%S"), None))
+                conn.commit()
+            else:
+                conn.execute(READ_SQL, (driver_id,)).fetchall()
+            conn.close()
+            ops += 1
+        except sqlite3.OperationalError:
+            # "database is locked" - what the old setup returns as a 500
+            errors += 1
+    results.put((role, ops, errors))
+
+def run(mode, source_db, writers, readers, seconds):
+    tmp = tempfile.mkdtemp(prefix="bench_db_")
+    path = os.path.join(tmp, "drivers.db")
+    shutil.copy(source_db, path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+
+    results = mp.Queue()
+    procs = [
+        mp.Process(target=worker, args=(mode, role, path, seconds, i, results))
+        for i, role in enumerate(["writer"] * writers + ["reader"] * readers)
+    ]
+    for p in procs:
+        p.start()
+    totals = {"writer": [0, 0], "reader": [0, 0]}
+    for _ in procs:
+        role, ops, errors = results.get()
+        totals[role][0] += ops
+        totals[role][1] += errors
+    for p in procs:
+        p.join()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite reader/writer throughput, per-op connect vs pooled WAL.")
+    parser.add_argument("--db", default="drivers.db")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'writes/s':>12}{'reads/s':>12}{'locked':>10}")
+    for mode in ("baseline", "pooled"):
+        totals = run(mode, args.db, args.writers, args.readers, args.seconds)
+        w, r = totals["writer"], totals["reader"]
+        print(f"{mode:<10}{w[0] / args.seconds:>12.1f}{r[0] / args.seconds:>12.1f}{w[1] + r[1]:>10}")
@@ -0,0 +1,91 @@
+# Shared tf.data input pipeline for training, evaluation and visualisation.
+#
+# Reads the same dataset/Drowsy_datset/{train,test}/<class>/*.jpg layout as
+# flow_from_directory (classes sorted by name, files sorted within a class,
+# binary float labels), but decodes in parallel on the TF runtime, can cache
+# decoded uint8 tensors on disk, augments whole batches at once and prefetches.
+import os
+import hashlib
+from collections import namedtuple
+import numpy as np
+import tensorflow as tf
+
+DATA_DIR = "dataset/Drowsy_datset"
+TRAIN_DIR = os.path.join(DATA_DIR, "train")
+TEST_DIR = os.path.join(DATA_DIR, "test")
+IMG_SIZE = (224, 224)
+CACHE_DIR = ".tfdata_cache"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+AUTOTUNE = tf.data.AUTOTUNE
+
+# same settings train_model.py used with ImageDataGenerator
+AUGMENTATION = dict(
+    rotation_range=15,
+    zoom_range=0.2,
+    horizontal_flip=True,
+)
+
+Split = namedtuple("Split", ["dataset", "labels", "class_indices", "filenames"])
+
+def list_images(directory):
+    classes = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    class_indices = {name: i for i, name in enumerate(classes)}
+    paths, labels = [], []
+    for name in classes:
+        class_dir = os.path.join(directory, name)
+        for root, dirs, files in sorted(os.walk(class_dir)):
+            dirs.sort()
+            for f in sorted(files):
+                if f.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, f))
+                    labels.append(class_indices[name])
+    return paths, np.asarray(labels, dtype=np.float32), class_indices
+
+def build_augmenter(rotation_range=0, zoom_range=0.0, horizontal_flip=False):
+    # Keras preprocessing layers transform a whole batch per call
+    layers = []
+    if horizontal_flip:
+        layers.append(tf.keras.layers.RandomFlip("horizontal"))
+    if rotation_range:
+        layers.append(tf.keras.layers.RandomRotation(rotation_range / 360.0, fill_mode="nearest"))
+    if zoom_range:
+        layers.append(tf.keras.layers.RandomZoom(zoom_range, fill_mode="nearest"))
+    return tf.keras.Sequential(layers)
+
+def _cache_path(paths, img_size):
+    h = hashlib.sha1()
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"{p}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    h.update(repr(tuple(img_size)).encode())
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, h.hexdigest()[:20])
+
+def make_dataset(directory, img_size=IMG_SIZE, batch_size=32, shuffle=False, augment=False,
+                 cache=True, seed=None):
+    # cache=True keeps decoded images in an on-disk cache keyed by the file
+    # list, "memory" keeps them in RAM, False decodes every epoch.
+    # augment=True applies AUGMENTATION; a dict gives build_augmenter() settings.
+    paths, labels, class_indices = list_images(directory)
+
+    def decode(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        # nearest-neighbour, like flow_from_directory's default interpolation
+        image = tf.image.resize(image, img_size, method="nearest")
+        return tf.cast(image, tf.uint8), label
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    ds = ds.map(decode, num_parallel_calls=AUTOTUNE, deterministic=True)
+    if cache == "memory":
+        ds = ds.cache()
+    elif cache:
+        ds = ds.cache(_cache_path(paths, img_size))
+    if shuffle:
+        ds = ds.shuffle(min(len(paths), 4096), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y), num_parallel_calls=AUTOTUNE)
+    if augment:
+        augmenter = build_augmenter(**(AUGMENTATION if augment is True else augment))
+        ds = ds.map(lambda x, y: (augmenter(x, training=True), y), num_parallel_calls=AUTOTUNE)
+    ds = ds.prefetch(AUTOTUNE)
+    return Split(ds, labels, class_indices, paths)
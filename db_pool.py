@@ -0,0 +1,147 @@
+import os
+import time
+import queue
+import sqlite3
+import threading
+
+# Applied once per physical connection. WAL lets dashboard readers run while
+# /api/event writers commit; synchronous=NORMAL is durable across app crashes
+# in WAL mode and skips the per-commit fsync of the main database file.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+class TimedCursor(sqlite3.Cursor):
+    # Reports statement time to the connection's observer (see metrics.py).
+    # execute() only steps to the first row, so fetches are timed as well
+    # (counted as time, not as extra queries).
+    def _timed(self, fn, args, queries):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.connection.observe(time.perf_counter() - started, queries)
+
+    def execute(self, *args):
+        return self._timed(super().execute, args, 1)
+
+    def executemany(self, *args):
+        return self._timed(super().executemany, args, 1)
+
+    def fetchone(self):
+        return self._timed(super().fetchone, (), 0)
+
+    def fetchmany(self, *args):
+        return self._timed(super().fetchmany, args, 0)
+
+    def fetchall(self):
+        return self._timed(super().fetchall, (), 0)
+
+class PooledConnection(sqlite3.Connection):
+    # close() hands the connection back to its pool, so existing
+    # `conn = db() ... conn.close()` code keeps working unchanged.
+    pool = None
+    checked_out = False
+    # bumped on every checkout so a stale holder can't release a later one
+    lease = 0
+    observer = None
+
+    def observe(self, seconds, queries):
+        if self.observer is not None:
+            self.observer(seconds, queries)
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = TimedCursor if self.observer is not None else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        if self.observer is None:
+            return super().execute(*args)
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        if self.observer is None:
+            return super().executemany(*args)
+        return self.cursor().executemany(*args)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def discard(self):
+        self.pool = None
+        super().close()
+
+class ConnectionPool:
+    def __init__(self, path, size=8, pragmas=PRAGMAS, row_factory=sqlite3.Row, timeout=5.0, observer=None):
+        self.path = path
+        # observer(seconds, queries) is called for every statement/fetch
+        self.observer = observer
+        self.size = size
+        self.pragmas = pragmas
+        self.row_factory = row_factory
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=self.size)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            factory=PooledConnection
+        )
+        conn.row_factory = self.row_factory
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        # connections must not cross a fork (gunicorn --preload); start over
+        # in the child and let the parent's handles be garbage collected
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._reset()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        conn.observer = self.observer
+        conn.lease += 1
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn, lease=None):
+        if not conn.checked_out:
+            return
+        if lease is not None and lease != conn.lease:
+            return
+        conn.checked_out = False
+        if conn.in_transaction:
+            conn.rollback()
+        if os.getpid() != self._pid:
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.discard()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().discard()
+            except queue.Empty:
+                break
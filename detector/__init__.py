@@ -0,0 +1,5 @@
+from .sources import FrameSource, VideoFileSource, ImageDirSource, CameraSource, open_source
+from .engine import DetectionEngine, ThresholdPolicy, StageStats
+from .sinks import HttpSink, DirectorySink, MemorySink, SpoolSink
+from .temporal import EpisodePolicy, ScoreRing
+from .spool import Spool, SpoolSender
@@ -0,0 +1,93 @@
+# Run the detection client on a camera, a video file or an image directory.
+#
+#   python -m detector --source drive.mp4 --driver-id 3 --out events.jsonl     # headless
+#   python -m detector --source 0 --driver-id 3 --server http://localhost:5000
+#   python -m detector --source drive.mp4 --realtime --model exports/model_int8.tflite
+import sys
+import json
+import time
+import argparse
+import threading
+import inference
+from . import (
+    open_source, DetectionEngine, EpisodePolicy, ThresholdPolicy,
+    HttpSink, DirectorySink, SpoolSink, Spool, SpoolSender
+)
+
+def print_report(report):
+    print(f"\n{'stage':<12}{'frames':>8}{'fps':>8}{'p50 ms':>9}{'p95 ms':>9}{'dropped':>9}")
+    for name, s in report.items():
+        if isinstance(s, dict) and "frames" in s:
+            print(f"{name:<12}{s['frames']:>8}{s['fps']:>8}{s['p50_ms']:>9}{s['p95_ms']:>9}{s['dropped']:>9}")
+    print(f"events: {report['events']} (outboxed {report['events_outboxed']}, lost {report['events_lost']})")
+    if "spool" in report:
+        print(f"spool: {report['spool']}")
+    if "alerts" in report:
+        print(f"alerts: {report['alerts']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m detector", description="Stream frames through model.h5 and post drowsiness events.")
+    parser.add_argument("--source", required=True, help="camera index, video file or image directory")
+    parser.add_argument("--driver-id", type=int, required=True)
+    parser.add_argument("--model", default="model.h5", help="any artifact inference.load_classifier accepts")
+    parser.add_argument("--server", help="base URL of the Flask server; events go to /api/events/upload")
+    parser.add_argument("--spool", help="with --server: durable local outbox (SQLite file), replayed when online")
+    parser.add_argument("--outbox", default="outbox.db",
+                        help="with --server and no --spool: failed uploads are kept here and retried in the background")
+    parser.add_argument("--out", default="events.jsonl", help="headless mode: NDJSON events file (snapshots under --records)")
+    parser.add_argument("--records", default="records")
+    parser.add_argument("--realtime", action="store_true", help="replay video at native FPS, dropping frames on overload")
+    parser.add_argument("--fps", type=float, default=None, help="image directory replay rate")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--policy", choices=("episode", "threshold"), default="episode",
+                        help="episode: one event per PERCLOS episode; threshold: one per drowsy frame (legacy)")
+    parser.add_argument("--threshold", type=float, default=0.5, help="per-frame drowsy score")
+    parser.add_argument("--window", type=float, default=3.0, help="PERCLOS window, seconds")
+    parser.add_argument("--on", type=float, default=0.6, help="PERCLOS that opens an episode")
+    parser.add_argument("--off", type=float, default=0.3, help="PERCLOS that closes it")
+    parser.add_argument("--min-duration", type=float, default=1.0)
+    parser.add_argument("--cooldown", type=float, default=10.0, help="seconds an episode is held open for merging")
+    parser.add_argument("--alert-sound", help="play this WAV in the cab when drowsiness is detected (e.g. alert.wav)")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--report-every", type=float, default=0, help="print stage stats every N seconds")
+    parser.add_argument("--json", action="store_true", help="print the final report as JSON")
+    args = parser.parse_args()
+
+    classifier = inference.load_classifier(args.model, num_threads=args.threads)
+    if args.policy == "episode":
+        policy = EpisodePolicy(args.window, args.threshold, args.on, args.off, args.min_duration, args.cooldown)
+    else:
+        policy = ThresholdPolicy(args.threshold, args.cooldown)
+    outbox = None
+    if args.server and args.spool:
+        spool = Spool(args.spool)
+        sink = SpoolSink(spool, SpoolSender(spool, args.server))
+    elif args.server:
+        sink = HttpSink(args.server)
+        spool = Spool(args.outbox)
+        outbox = SpoolSink(spool, SpoolSender(spool, args.server))
+    else:
+        sink = DirectorySink(args.records, args.out)
+    alerts = None
+    if args.alert_sound:
+        from alerts import AlertPlayer
+        alerts = AlertPlayer(args.alert_sound)
+    engine = DetectionEngine(
+        open_source(args.source, realtime=args.realtime, fps=args.fps), classifier, sink, args.driver_id,
+        policy=policy, batch_size=args.batch_size, alerts=alerts, outbox=outbox,
+    )
+
+    if args.report_every:
+        def periodic():
+            while True:
+                time.sleep(args.report_every)
+                print_report(engine.report())
+        threading.Thread(target=periodic, daemon=True).start()
+
+    print(f"🎥 Streaming {args.source} -> {args.server or args.out}")
+    report = engine.run()
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
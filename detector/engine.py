@@ -0,0 +1,337 @@
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import deque
+import numpy as np
+from .temporal import EpisodePolicy, format_ts
+
+log = logging.getLogger(__name__)
+
+_DONE = object()
+# how often a stage blocked on a full queue checks for stop(); bounds how
+# long a failing stage takes to bring the pipeline down
+STOP_POLL = 0.02
+
+class StageStats:
+    def __init__(self, name, window=512):
+        self.name = name
+        self.count = 0
+        self.dropped = 0
+        self.started = time.perf_counter()
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, n=1):
+        with self._lock:
+            self.count += n
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            lat = np.asarray(self.latencies) * 1000 if self.latencies else np.zeros(1)
+            elapsed = time.perf_counter() - self.started
+            return {
+                "frames": self.count,
+                "dropped": self.dropped,
+                "fps": round(self.count / elapsed, 1) if elapsed > 0 else 0.0,
+                "p50_ms": round(float(np.percentile(lat, 50)), 2),
+                "p95_ms": round(float(np.percentile(lat, 95)), 2),
+            }
+
+class Frame:
+    __slots__ = ("ts", "captured", "image", "tensor", "score")
+
+    def __init__(self, ts, image):
+        self.ts = ts
+        self.captured = time.perf_counter()
+        self.image = image
+        self.tensor = None
+        self.score = None
+
+class ThresholdPolicy:
+    # One event whenever the score crosses `threshold`, at most one per
+    # `cooldown` s. Per-frame and noisy; EpisodePolicy is the default.
+    def __init__(self, threshold=0.5, cooldown=5.0, event_type="drowsiness"):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.event_type = event_type
+        self._last = {}
+        self._above = {}
+
+    def update(self, driver_id, ts, score, frame):
+        self._above[driver_id] = score >= self.threshold
+        if score < self.threshold or ts - self._last.get(driver_id, -1e18) < self.cooldown:
+            return None
+        self._last[driver_id] = ts
+        return {"event_type": self.event_type, "ts": ts, "peak_score": round(float(score), 4)}
+
+    def active(self, driver_id):
+        # alarm while the latest frame is over the threshold
+        return self._above.get(driver_id, False)
+
+    def flush(self, driver_id):
+        return None
+
+class DetectionEngine:
+    # capture -> preprocess -> inference (batched) -> upload, one thread per
+    # stage, connected by bounded queues. With a live source, a full queue
+    # drops the oldest frame instead of blocking the camera, so end-to-end
+    # latency stays bounded under overload.
+
+    def __init__(self, source, classifier, sink, driver_id, policy=None,
+                 batch_size=8, max_batch_wait=0.02, queue_size=16, upload_batch=16,
+                 alerts=None, alert_interval=3.0, outbox=None):
+        self.source = source
+        self.classifier = classifier
+        self.sink = sink
+        # events the sink fails to take go here (e.g. a SpoolSink) instead
+        # of being dropped
+        self.outbox = outbox
+        self.driver_id = driver_id
+        self.policy = policy or EpisodePolicy()
+        self.batch_size = batch_size
+        self.max_batch_wait = max_batch_wait
+        self.upload_batch = upload_batch
+        # in-cab alarm (alerts.AlertPlayer): fires at episode onset, and
+        # again every alert_interval s while it lasts so the player escalates;
+        # silenced as soon as the policy is no longer active
+        self.alerts = alerts
+        self.alert_interval = alert_interval
+        self._last_alert = None
+
+        self.q_pre = queue.Queue(queue_size)
+        self.q_infer = queue.Queue(queue_size)
+        self.q_upload = queue.Queue(queue_size * 4)
+        self.stats = {name: StageStats(name) for name in ("capture", "preprocess", "inference", "upload")}
+        self.end_to_end = StageStats("end_to_end")
+        self.events_emitted = 0
+        self.events_outboxed = 0
+        self.events_lost = 0
+        self._stop = threading.Event()
+        self._threads = []
+        self._error = None
+
+    # ---------------- queues ---------------- #
+
+    def _put(self, q, item, stage, drop_oldest):
+        # -> False if stop() won before a blocking put got through
+        if not drop_oldest:
+            while not self._stop.is_set():
+                try:
+                    q.put(item, timeout=STOP_POLL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        while True:
+            try:
+                q.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    self.stats[stage].dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _finish(self, q, stage):
+        # the end-of-stream marker must always get through, even when the
+        # engine is stopping and the consumer's queue is full
+        if not self._put(q, _DONE, stage, False):
+            self._put(q, _DONE, stage, True)
+
+    # ---------------- stages ---------------- #
+
+    def _capture(self):
+        stats = self.stats["capture"]
+        try:
+            for ts, image in self.source.frames():
+                if self._stop.is_set():
+                    break
+                started = time.perf_counter()
+                self._put(self.q_pre, Frame(ts, image), "preprocess", self.source.live)
+                stats.record(time.perf_counter() - started)
+        finally:
+            self.source.close()
+            self._finish(self.q_pre, "preprocess")
+
+    def _preprocess(self):
+        stats = self.stats["preprocess"]
+        try:
+            while True:
+                frame = self.q_pre.get()
+                if frame is _DONE:
+                    break
+                started = time.perf_counter()
+                frame.tensor = self.classifier.preprocess(frame.image)
+                self._put(self.q_infer, frame, "inference", self.source.live)
+                stats.record(time.perf_counter() - started)
+        finally:
+            self._finish(self.q_infer, "inference")
+
+    def _next_batch(self):
+        first = self.q_infer.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.max_batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                frame = self.q_infer.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if frame is _DONE:
+                return batch, True
+            batch.append(frame)
+        return batch, False
+
+    def _inference(self):
+        stats = self.stats["inference"]
+        done = False
+        try:
+            while not done:
+                batch, done = self._next_batch()
+                if not batch:
+                    break
+                started = time.perf_counter()
+                scores = self.classifier.drowsy_scores(np.stack([f.tensor for f in batch]))
+                stats.record(time.perf_counter() - started, n=len(batch))
+                now = time.perf_counter()
+                for frame, score in zip(batch, scores):
+                    frame.score = float(score)
+                    self.end_to_end.record(now - frame.captured)
+                    self._emit(self.policy.update(self.driver_id, frame.ts, frame.score, frame), frame)
+                    self._alert(frame.ts)
+            self._emit(self.policy.flush(self.driver_id), None)
+            if self._last_alert is not None:
+                self._last_alert = None
+                self.alerts.silence()
+        finally:
+            self._finish(self.q_upload, "upload")
+
+    def _alert(self, ts):
+        if self.alerts is None:
+            return
+        if not self.policy.active(self.driver_id):
+            if self._last_alert is not None:
+                self._last_alert = None
+                self.alerts.silence()
+        elif self._last_alert is None or ts - self._last_alert >= self.alert_interval:
+            self._last_alert = ts
+            self.alerts.trigger()
+
+    def _emit(self, decision, frame):
+        if not decision:
+            return
+        event = {
+            "driver_id": self.driver_id,
+            "ts": format_ts(decision.pop("ts")),
+            "image_path": None,
+            # lets the server drop a re-send whose first response was lost
+            "idempotency_key": uuid.uuid4().hex,
+        }
+        snapshot = decision.pop("frame", None)
+        event.update(decision)
+        event["frame"] = snapshot if snapshot is not None else (frame.image if frame else None)
+        self.events_emitted += 1
+        self._put(self.q_upload, event, "upload", False)
+
+    def _upload(self):
+        stats = self.stats["upload"]
+        done = False
+        try:
+            while not done:
+                item = self.q_upload.get()
+                if item is _DONE:
+                    break
+                events = [item]
+                while len(events) < self.upload_batch:
+                    try:
+                        item = self.q_upload.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        done = True
+                        break
+                    events.append(item)
+                started = time.perf_counter()
+                try:
+                    # sinks consume the transient "frame"; keep it for the outbox
+                    self.sink.send([dict(e) for e in events])
+                except Exception:
+                    self._to_outbox(events)
+                stats.record(time.perf_counter() - started, n=len(events))
+        finally:
+            self.sink.close()
+            if self.outbox is not None:
+                self.outbox.close()
+
+    def _to_outbox(self, events):
+        if self.outbox is None:
+            log.exception("upload of %d events failed, dropping them", len(events))
+            self.events_lost += len(events)
+            return
+        log.warning("upload of %d events failed, keeping them in the outbox", len(events), exc_info=True)
+        try:
+            self.outbox.send(events)
+            self.events_outboxed += len(events)
+        except Exception:
+            log.exception("outbox rejected %d events, dropping them", len(events))
+            self.events_lost += len(events)
+
+    # ---------------- control ---------------- #
+
+    def _run_stage(self, stage):
+        # a failing stage stops the whole pipeline (its finally still passes
+        # _DONE on) and the first error is re-raised from run()
+        try:
+            stage()
+        except BaseException as e:
+            log.exception("%s stage failed", stage.__name__.lstrip("_"))
+            if self._error is None:
+                self._error = e
+            self._stop.set()
+
+    def start(self):
+        for name in ("capture", "preprocess", "inference", "upload"):
+            t = threading.Thread(target=self._run_stage, args=(getattr(self, "_" + name),),
+                                 name=f"detector-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        for t in self._threads:
+            t.join(timeout)
+
+    def run(self):
+        self.start()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            self.stop()
+            self.join(5)
+        if self._error is not None:
+            raise self._error
+        return self.report()
+
+    def report(self):
+        report = {name: s.snapshot() for name, s in self.stats.items()}
+        report["end_to_end"] = self.end_to_end.snapshot()
+        report["events"] = self.events_emitted
+        report["events_outboxed"] = self.events_outboxed
+        report["events_lost"] = self.events_lost
+        if hasattr(self.sink, "stats"):
+            report["spool"] = self.sink.stats()
+        elif hasattr(self.outbox, "stats"):
+            report["spool"] = self.outbox.stats()
+        if self.alerts is not None:
+            report["alerts"] = self.alerts.stats()
+        return report
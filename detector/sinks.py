@@ -0,0 +1,99 @@
+import os
+import json
+import itertools
+import time
+import cv2
+import requests
+
+# Sinks receive lists of events in the api_event() shape
+#     {"driver_id", "event_type", "ts", "image_path"}
+# plus a transient "frame" (RGB uint8) holding the snapshot to store/upload.
+
+def encode_jpeg(frame, quality=85):
+    ok, buf = cv2.imencode(".jpg", cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buf.tobytes()
+
+class MemorySink:
+    def __init__(self):
+        self.events = []
+
+    def send(self, events):
+        self.events.extend({k: v for k, v in e.items() if k != "frame"} for e in events)
+
+    def close(self):
+        pass
+
+class DirectorySink:
+    # Headless/offline: snapshots go to records/<driver_id>/event_<epoch>_<seq>.jpg
+    # (the layout the server serves) and events are appended as NDJSON, ready
+    # for POST /api/events/batch.
+    def __init__(self, records_dir="records", events_path="events.jsonl"):
+        self.records_dir = records_dir
+        self.out = open(events_path, "a", encoding="utf-8")
+        # several events of one batch can share a millisecond
+        self._seq = itertools.count()
+
+    def send(self, events):
+        for e in events:
+            frame = e.pop("frame", None)
+            if frame is not None:
+                folder = os.path.join(self.records_dir, str(e["driver_id"]))
+                os.makedirs(folder, exist_ok=True)
+                name = f"event_{int(time.time() * 1000)}_{next(self._seq)}.jpg"
+                with open(os.path.join(folder, name), "wb") as f:
+                    f.write(encode_jpeg(frame))
+                e["image_path"] = f"records/{e['driver_id']}/{name}"
+            self.out.write(json.dumps(e) + "\n")
+        self.out.flush()
+
+    def close(self):
+        self.out.close()
+
+class HttpSink:
+    # One multipart request per batch to /api/events/upload (events + JPEGs)
+    def __init__(self, server, timeout=10.0):
+        self.url = server.rstrip("/") + "/api/events/upload"
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, events):
+        files, items = {}, []
+        for i, e in enumerate(events):
+            frame = e.pop("frame", None)
+            if frame is not None:
+                files[f"img{i}"] = (f"img{i}.jpg", encode_jpeg(frame), "image/jpeg")
+                e["image"] = f"img{i}"
+            items.append(e)
+        r = self.session.post(self.url, data={"events": json.dumps(items)}, files=files, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def close(self):
+        self.session.close()
+
+class SpoolSink:
+    # Durable variant of HttpSink: events are committed to the local spool
+    # first and a background SpoolSender delivers them when the server is up.
+    def __init__(self, spool, sender, drain_timeout=10.0):
+        self.spool = spool
+        self.sender = sender
+        self.drain_timeout = drain_timeout
+        self._final_stats = None
+        sender.start()
+
+    def send(self, events):
+        for e in events:
+            frame = e.pop("frame", None)
+            self.spool.append(e, encode_jpeg(frame) if frame is not None else None)
+        self.sender.wake()
+
+    def stats(self):
+        # pending, oldest_age_s, bytes, drain_rate_per_s, ...
+        return self._final_stats or self.sender.stats()
+
+    def close(self):
+        self.sender.stop(drain_timeout=self.drain_timeout)
+        self._final_stats = self.sender.stats()
+        self.spool.close()
@@ -0,0 +1,95 @@
+import os
+import time
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+class FrameSource:
+    # Yields (timestamp, rgb_uint8_frame). `live` sources produce frames on
+    # their own clock, so the engine drops frames rather than queueing them.
+    live = False
+
+    def frames(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class VideoFileSource(FrameSource):
+    def __init__(self, path, realtime=False, loop=False):
+        # realtime=True replays at the file's native FPS (and may drop frames
+        # like a camera would); otherwise frames are read as fast as consumed
+        self.path = path
+        self.live = realtime
+        self.loop = loop
+        self.cap = None
+
+    def frames(self):
+        while True:
+            self.cap = cv2.VideoCapture(self.path)
+            if not self.cap.isOpened():
+                raise IOError(f"cannot open video {self.path}")
+            fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+            started = time.perf_counter()
+            index = 0
+            while True:
+                ok, frame = self.cap.read()
+                if not ok:
+                    break
+                if self.live:
+                    delay = started + index / fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                index += 1
+                yield time.time(), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            self.cap.release()
+            if not self.loop:
+                return
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+
+class ImageDirSource(FrameSource):
+    def __init__(self, directory, fps=None):
+        self.directory = directory
+        self.fps = fps
+        self.live = fps is not None
+
+    def frames(self):
+        names = sorted(n for n in os.listdir(self.directory) if n.lower().endswith(IMAGE_EXTENSIONS))
+        for name in names:
+            frame = cv2.imread(os.path.join(self.directory, name))
+            if frame is None:
+                continue
+            if self.fps:
+                time.sleep(1.0 / self.fps)
+            yield time.time(), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+class CameraSource(FrameSource):
+    live = True
+
+    def __init__(self, index=0, width=None, height=None):
+        self.cap = cv2.VideoCapture(index)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    def frames(self):
+        while self.cap.isOpened():
+            ok, frame = self.cap.read()
+            if not ok:
+                break
+            yield time.time(), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        self.cap.release()
+
+def open_source(spec, realtime=False, fps=None):
+    # "0" / "1" -> camera index, a directory -> image dir, anything else -> video file
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, fps=fps)
+    return VideoFileSource(spec, realtime=realtime)
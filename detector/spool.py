@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import logging
+import threading
+from collections import deque
+import requests
+
+log = logging.getLogger(__name__)
+
+# Durable, offline-first outbox for detection events. Every event is written
+# to a local SQLite file (snapshot JPEGs next to it) before any network I/O;
+# a background sender drains the spool oldest-first in batches through
+# /api/events/upload. Each event carries a client-generated idempotency_key,
+# so re-sending a batch whose response was lost never duplicates rows on the
+# server. While the server is unreachable the sender backs off exponentially
+# (with jitter, honouring Retry-After) and the spool simply grows.
+
+class RetryLater(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        try:
+            self.retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            self.retry_after = None
+
+class Spool:
+    def __init__(self, path="spool.db"):
+        self.path = path
+        self.snapshot_dir = os.path.splitext(path)[0] + "_snapshots"
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # the cab can lose power at any time; an acknowledged append must survive it
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending(
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                event TEXT NOT NULL,
+                snapshot TEXT,
+                created REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rejected(
+                idempotency_key TEXT PRIMARY KEY,
+                event TEXT NOT NULL,
+                error TEXT,
+                rejected_at REAL NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+
+    def append(self, event, jpeg=None):
+        event = dict(event)
+        key = event.setdefault("idempotency_key", uuid.uuid4().hex)
+        snapshot = None
+        if jpeg is not None:
+            snapshot = os.path.join(self.snapshot_dir, key + ".jpg")
+            with open(snapshot, "wb") as f:
+                f.write(jpeg)
+                f.flush()
+                os.fsync(f.fileno())
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO pending(idempotency_key, event, snapshot, created) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(event), snapshot, time.time())
+            )
+        return key
+
+    def peek(self, limit):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT seq, idempotency_key, event, snapshot FROM pending ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+
+    def ack(self, seqs, rejected=()):
+        # rejected: (key, event json, error) for items the server refused as invalid
+        with self._lock:
+            self.conn.execute("BEGIN")
+            if rejected:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO rejected(idempotency_key, event, error, rejected_at) VALUES (?, ?, ?, ?)",
+                    [r + (time.time(),) for r in rejected]
+                )
+            rows = self.conn.execute(
+                "SELECT snapshot FROM pending WHERE seq IN (%s)" % ",".join("?" * len(seqs)), seqs
+            ).fetchall()
+            self.conn.execute("DELETE FROM pending WHERE seq IN (%s)" % ",".join("?" * len(seqs)), seqs)
+            self.conn.execute("COMMIT")
+        for (snapshot,) in rows:
+            if snapshot and os.path.exists(snapshot):
+                os.remove(snapshot)
+
+    def stats(self):
+        with self._lock:
+            n, oldest = self.conn.execute("SELECT COUNT(*), MIN(created) FROM pending").fetchone()
+            rejected = self.conn.execute("SELECT COUNT(*) FROM rejected").fetchone()[0]
+        size = sum(e.stat().st_size for e in os.scandir(self.snapshot_dir))
+        for suffix in ("", "-wal"):
+            if os.path.exists(self.path + suffix):
+                size += os.path.getsize(self.path + suffix)
+        return {
+            "pending": n,
+            "oldest_age_s": round(time.time() - oldest, 1) if oldest else 0.0,
+            "bytes": size,
+            "rejected": rejected,
+        }
+
+    def close(self):
+        self.conn.close()
+
+class SpoolSender:
+    def __init__(self, spool, server, batch_size=100, timeout=15.0,
+                 backoff_base=1.0, backoff_max=300.0, idle_interval=1.0):
+        self.spool = spool
+        self.url = server.rstrip("/") + "/api/events/upload"
+        self.batch_size = batch_size
+        self.max_batch_size = batch_size
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_interval = idle_interval
+        self.session = requests.Session()
+
+        self.sent = 0
+        self.duplicates = 0
+        self.queued = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.backoff = 0.0
+        self._drained = deque()  # (time, n) for the drain rate
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="spool-sender", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, drain_timeout=0.0):
+        # optionally keep draining for up to drain_timeout s before exiting
+        deadline = time.time() + drain_timeout
+        while drain_timeout and time.time() < deadline and self.spool.stats()["pending"] and not self.backoff:
+            time.sleep(0.1)
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(self.timeout + 1)
+        self.session.close()
+
+    def _post(self, rows):
+        files, items = {}, []
+        try:
+            for i, (_, _, event, snapshot) in enumerate(rows):
+                item = json.loads(event)
+                if snapshot and os.path.exists(snapshot):
+                    files[f"img{i}"] = (f"img{i}.jpg", open(snapshot, "rb"), "image/jpeg")
+                    item["image"] = f"img{i}"
+                items.append(item)
+            return self.session.post(self.url, data={"events": json.dumps(items)}, files=files,
+                                     timeout=self.timeout, allow_redirects=False)
+        finally:
+            for _, f, _ in files.values():
+                f.close()
+
+    def send_batch(self):
+        # -> number of events acknowledged; raises on transport/server errors.
+        # Only our API's own verdicts are terminal: per-item "error" results,
+        # or a JSON {"status": "error"} 400 for the whole request. Anything
+        # else (proxy/captive-portal pages, redirects, 401/403/404/408, an
+        # older server without this endpoint) is retried, never dropped.
+        rows = self.spool.peek(self.batch_size)
+        if not rows:
+            return 0
+        r = self._post(rows)
+        if r.status_code == 413 and len(rows) > 1:
+            self.batch_size = max(1, len(rows) // 2)
+            return 0
+        body = None
+        if r.headers.get("Content-Type", "").startswith("application/json"):
+            body = r.json()
+        refused = isinstance(body, dict) and body.get("status") == "error"
+        if refused and (r.status_code == 400 or r.status_code == 413):
+            # whole request refused as invalid (a lone event too large counts
+            # too); reject the batch so it cannot wedge the spool
+            results = [{"index": i, "status": "error", "error": body.get("error")} for i in range(len(rows))]
+        elif r.status_code in (200, 202) and isinstance(body, dict) and isinstance(body.get("results"), list):
+            results = body["results"]
+        else:
+            raise RetryLater(r.status_code, r.headers.get("Retry-After"))
+        acked, rejected = [], []
+        for res in results:
+            seq, key, event, _ = rows[res["index"]]
+            acked.append(seq)
+            if res["status"] == "duplicate":
+                self.duplicates += 1
+            elif res["status"] == "queued":
+                # accepted into the server's write-behind queue (202): acked
+                # here like a commit, so it is only as durable as that queue
+                self.queued += 1
+            elif res["status"] == "error":
+                rejected.append((key, event, res.get("error")))
+        self.spool.ack(acked, rejected)
+        self.sent += len(acked) - len(rejected)
+        self._drained.append((time.time(), len(acked)))
+        if len(rows) == self.batch_size:
+            # recover from a 413 split once batches go through again
+            self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+        return len(acked)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                n = self.send_batch()
+            except (requests.RequestException, RetryLater, ValueError) as e:
+                self.failures += 1
+                self.consecutive_failures += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (self.consecutive_failures - 1))
+                delay = delay * random.uniform(0.5, 1.0)
+                if isinstance(e, RetryLater) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                self.backoff = delay
+                log.warning("spool send failed (%s), retrying in %.1fs", e, delay)
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            self.consecutive_failures = 0
+            self.backoff = 0.0
+            if n < self.batch_size:
+                self._wake.wait(self.idle_interval)
+                self._wake.clear()
+
+    def drain_rate(self, window=60.0):
+        cutoff = time.time() - window
+        while self._drained and self._drained[0][0] < cutoff:
+            self._drained.popleft()
+        return round(sum(n for _, n in self._drained) / window, 2)
+
+    def stats(self):
+        return dict(
+            self.spool.stats(),
+            sent=self.sent,
+            duplicates=self.duplicates,
+            queued=self.queued,
+            failures=self.failures,
+            backoff_s=round(self.backoff, 1),
+            drain_rate_per_s=self.drain_rate(),
+        )
@@ -0,0 +1,126 @@
+import time
+import numpy as np
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def format_ts(epoch):
+    return time.strftime(TS_FORMAT, time.localtime(epoch))
+
+class ScoreRing:
+    # Fixed-size ring of (timestamp, score); window metrics are one masked
+    # NumPy reduction over the whole buffer, no per-frame Python loops.
+    def __init__(self, capacity=256):
+        self.times = np.full(capacity, -np.inf)
+        self.scores = np.zeros(capacity, dtype=np.float32)
+        self.pos = 0
+
+    def push(self, ts, score):
+        self.times[self.pos] = ts
+        self.scores[self.pos] = score
+        self.pos = (self.pos + 1) % len(self.times)
+
+    def metrics(self, now, seconds, frame_threshold):
+        mask = self.times > now - seconds
+        n = int(mask.sum())
+        if not n:
+            return {"n": 0, "perclos": 0.0, "mean": 0.0, "peak": 0.0, "onset": now}
+        scores = self.scores[mask]
+        closed = scores >= frame_threshold
+        return {
+            "n": n,
+            # PERCLOS: share of the window's frames classified drowsy
+            "perclos": float(closed.mean()),
+            "mean": float(scores.mean()),
+            "peak": float(scores.max()),
+            "onset": float(self.times[mask][closed].min()) if closed.any() else now,
+        }
+
+class _DriverState:
+    __slots__ = ("ring", "active", "start", "end", "peak", "peak_frame")
+
+    def __init__(self, capacity):
+        self.ring = ScoreRing(capacity)
+        self.active = False
+        self.start = self.end = None
+        self.peak = 0.0
+        self.peak_frame = None
+
+class EpisodePolicy:
+    # One event per drowsiness episode instead of one per noisy frame.
+    #   - an episode opens when windowed PERCLOS reaches `on_perclos` and
+    #     closes when it falls to `off_perclos` (hysteresis)
+    #   - a closed episode is held for `cooldown` seconds; if PERCLOS rises
+    #     again in that time the same episode resumes
+    #   - episodes shorter than `min_duration` are discarded
+    # The event carries the onset time as `ts`, episode_start/episode_end,
+    # peak_score and the snapshot of the peak frame.
+
+    def __init__(self, window=3.0, frame_threshold=0.5, on_perclos=0.6, off_perclos=0.3,
+                 min_duration=1.0, cooldown=10.0, min_frames=5, capacity=256, event_type="drowsiness"):
+        self.window = window
+        self.frame_threshold = frame_threshold
+        self.on_perclos = on_perclos
+        self.off_perclos = off_perclos
+        self.min_duration = min_duration
+        self.cooldown = cooldown
+        self.min_frames = min_frames
+        self.capacity = capacity
+        self.event_type = event_type
+        self._drivers = {}
+
+    def update(self, driver_id, ts, score, frame):
+        state = self._drivers.get(driver_id)
+        if state is None:
+            state = self._drivers[driver_id] = _DriverState(self.capacity)
+        state.ring.push(ts, score)
+        m = state.ring.metrics(ts, self.window, self.frame_threshold)
+        decision = None
+
+        if state.active:
+            if score > state.peak:
+                state.peak, state.peak_frame = score, getattr(frame, "image", None)
+            if m["perclos"] <= self.off_perclos:
+                state.active = False
+                state.end = ts
+        elif m["n"] >= self.min_frames and m["perclos"] >= self.on_perclos:
+            if state.start is not None and ts - state.end < self.cooldown:
+                state.active = True  # resume the held episode
+            else:
+                if state.start is not None:
+                    decision = self._close(state)
+                state.active = True
+                state.start = m["onset"]
+                state.peak, state.peak_frame = score, getattr(frame, "image", None)
+        elif state.start is not None and ts - state.end >= self.cooldown:
+            decision = self._close(state)
+
+        return decision
+
+    def active(self, driver_id):
+        state = self._drivers.get(driver_id)
+        return state is not None and state.active
+
+    def flush(self, driver_id):
+        state = self._drivers.get(driver_id)
+        if state is None or state.start is None:
+            return None
+        if state.active:
+            state.end = state.ring.times.max()
+        return self._close(state)
+
+    def _close(self, state):
+        start, end = state.start, state.end
+        peak, frame = state.peak, state.peak_frame
+        state.active = False
+        state.start = state.end = state.peak_frame = None
+        state.peak = 0.0
+        if end - start < self.min_duration:
+            return None
+        return {
+            "event_type": self.event_type,
+            "ts": start,
+            "episode_start": format_ts(start),
+            "episode_end": format_ts(end),
+            "peak_score": round(float(peak), 4),
+            "frame": frame,
+        }
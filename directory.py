@@ -0,0 +1,87 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Driver directory for the passenger page: bounded prefix search on the
+# NOCASE name index plus a small per-process result cache. register() calls
+# invalidate(); the TTL covers registrations handled by other workers.
+
+MAX_RESULTS = 25
+# NOCASE compares UTF-8 bytes after ASCII folding; no valid character sorts
+# above U+10FFFF, so prefix + this is an exclusive upper bound for the range
+PREFIX_END = "\U0010ffff"
+
+def init_directory_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_drivers_name_nocase ON drivers(name COLLATE NOCASE)")
+
+def search_drivers(conn, q, limit=10):
+    # index range scan, never more than `limit` rows read
+    q = q.strip()
+    if not q:
+        return []
+    limit = min(max(limit, 1), MAX_RESULTS)
+    found = []
+    if q.isdigit():
+        row = conn.execute("SELECT id, name FROM drivers WHERE id=?", (int(q),)).fetchone()
+        if row:
+            found.append({"id": row[0], "name": row[1]})
+    rows = conn.execute(
+        """SELECT id, name FROM drivers
+           WHERE name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ?
+           ORDER BY name COLLATE NOCASE, id
+           LIMIT ?""",
+        (q, q + PREFIX_END, limit)
+    ).fetchall()
+    found.extend({"id": r[0], "name": r[1]} for r in rows if not found or r[0] != found[0]["id"])
+    return found[:limit]
+
+class DriverDirectory:
+    def __init__(self, ttl=60.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = (now, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    def search(self, get_conn, q, limit=10):
+        def compute():
+            conn = get_conn()
+            try:
+                return search_drivers(conn, q, limit)
+            finally:
+                conn.close()
+        return self._cached(("search", q.strip().lower(), limit), compute)
+
+    def count(self, get_conn):
+        def compute():
+            conn = get_conn()
+            try:
+                return conn.execute("SELECT COUNT(*) FROM drivers").fetchone()[0]
+            finally:
+                conn.close()
+        return self._cached(("count",), compute)
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,136 @@
+# Knowledge distillation: model.h5 (MobileNetV2-224) teaches smaller students.
+#
+#   python distill.py                                   # default variants
+#   python distill.py --variants 96:0.35,128:0.5 --epochs 15
+#
+# A variant is <input px>:<width multiplier>. Each student is a MobileNetV2 at
+# that resolution/width with the same Dense head, trained on a mix of the hard
+# labels and the teacher's temperature-softened scores. Students are saved to
+# students/, exported to dynamic-range TFLite, and compared in an
+# accuracy vs. latency table (students/report.json) so each hardware tier can
+# pick its model.
+import os
+import json
+import argparse
+import tensorflow as tf
+from tensorflow.keras.applications import MobileNetV2
+from tensorflow.keras.models import Model, load_model
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout, Activation
+from tensorflow.keras.optimizers import Adam
+import data_pipeline
+import export_model
+import inference
+
+TEACHER_PATH = "model.h5"
+STUDENT_DIR = "students"
+DEFAULT_VARIANTS = "96:0.35,128:0.35,128:0.5,160:0.5"
+BATCH_SIZE = 32
+EPOCHS = 10
+TEMPERATURE = 4.0
+HARD_WEIGHT = 0.3  # share of the loss on the true labels, the rest follows the teacher
+EPS = 1e-7
+
+def build_student(resolution, alpha):
+    base = MobileNetV2(weights="imagenet", include_top=False, alpha=alpha,
+                       input_shape=(resolution, resolution, 3))
+    x = GlobalAveragePooling2D()(base.output)
+    x = Dropout(0.3)(x)
+    x = Dense(128, activation="relu")(x)
+    x = Dropout(0.3)(x)
+    logits = Dense(1)(x)
+    # train on logits, deploy with a sigmoid like model.h5
+    return Model(base.input, logits), Model(base.input, Activation("sigmoid")(logits))
+
+def to_logit(p):
+    p = tf.clip_by_value(p, EPS, 1 - EPS)
+    return tf.math.log(p) - tf.math.log(1 - p)
+
+class Distiller(Model):
+    def __init__(self, student, teacher, resolution):
+        super().__init__()
+        self.student = student
+        self.teacher = teacher
+        self.resolution = resolution
+        self.bce = tf.keras.losses.BinaryCrossentropy(from_logits=True)
+
+    def _student_input(self, x):
+        return tf.image.resize(x, (self.resolution, self.resolution), method="nearest")
+
+    def train_step(self, data):
+        x, y = data
+        y = tf.reshape(tf.cast(y, tf.float32), (-1, 1))
+        soft = tf.sigmoid(to_logit(self.teacher(x, training=False)) / TEMPERATURE)
+        with tf.GradientTape() as tape:
+            logits = self.student(self._student_input(x), training=True)
+            hard_loss = self.bce(y, logits)
+            # T^2 keeps the soft-label gradients on the same scale as the hard ones
+            soft_loss = self.bce(soft, logits / TEMPERATURE) * TEMPERATURE ** 2
+            loss = HARD_WEIGHT * hard_loss + (1 - HARD_WEIGHT) * soft_loss
+        grads = tape.gradient(loss, self.student.trainable_variables)
+        self.optimizer.apply_gradients(zip(grads, self.student.trainable_variables))
+        acc = tf.reduce_mean(tf.cast(tf.cast(logits > 0, tf.float32) == y, tf.float32))
+        return {"loss": loss, "hard_loss": hard_loss, "soft_loss": soft_loss, "accuracy": acc}
+
+def measure(path, resolution, args):
+    clf = inference.load_classifier(path, num_threads=args.threads)
+    test = data_pipeline.make_dataset(data_pipeline.TEST_DIR, (resolution, resolution), batch_size=BATCH_SIZE)
+    accuracy, _ = inference.evaluate_accuracy(clf, test.dataset, test.labels)
+    return {
+        "path": path,
+        "size_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+        "accuracy": round(accuracy, 4),
+        "latency": inference.benchmark_latency(clf, runs=args.runs, batch_size=1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distil model.h5 into smaller, lower-resolution students.")
+    parser.add_argument("--teacher", default=TEACHER_PATH)
+    parser.add_argument("--variants", default=DEFAULT_VARIANTS, help="comma list of <px>:<alpha>")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    os.makedirs(STUDENT_DIR, exist_ok=True)
+    teacher = load_model(args.teacher)
+    teacher.trainable = False
+    teacher_size = tuple(teacher.input_shape[1:3])
+
+    train = data_pipeline.make_dataset(data_pipeline.TRAIN_DIR, teacher_size, BATCH_SIZE, shuffle=True, augment=True)
+
+    report = {"teacher": measure(args.teacher, teacher_size[0], args)}
+    report["teacher"]["variant"] = f"{teacher_size[0]}px MobileNetV2 (teacher)"
+
+    for spec in args.variants.split(","):
+        resolution, alpha = int(spec.split(":")[0]), float(spec.split(":")[1])
+        name = f"student_{resolution}_a{alpha:g}"
+        print(f"\n🎓 Distilling {name}")
+
+        student_logits, student = build_student(resolution, alpha)
+        distiller = Distiller(student_logits, teacher, resolution)
+        distiller.compile(optimizer=Adam(1e-4))
+        distiller.fit(train.dataset, epochs=args.epochs)
+
+        h5_path = os.path.join(STUDENT_DIR, name + ".h5")
+        student.save(h5_path)
+        tflite_path = export_model.export_tflite(
+            student, "dynamic", (resolution, resolution),
+            path=os.path.join(STUDENT_DIR, name + "_dynamic.tflite")
+        )
+        # students learn the teacher's labels, so they share its class order
+        inference.copy_label_map(args.teacher, h5_path)
+        inference.copy_label_map(args.teacher, tflite_path)
+        for variant, path in ((name, h5_path), (name + " (tflite dyn)", tflite_path)):
+            report[variant] = measure(path, resolution, args)
+            report[variant]["variant"] = f"{resolution}px α={alpha:g}"
+
+    base_acc = report["teacher"]["accuracy"]
+    with open(os.path.join(STUDENT_DIR, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'model':<32}{'size MB':>9}{'p50 ms':>9}{'p95 ms':>9}{'img/s':>9}{'acc':>8}{'Δacc':>8}")
+    for name, r in report.items():
+        lat = r["latency"]
+        print(f"{name:<32}{r['size_mb']:>9}{lat['p50_ms']:>9}{lat['p95_ms']:>9}"
+              f"{lat['images_per_sec']:>9}{r['accuracy']:>8.4f}{r['accuracy'] - base_acc:>+8.4f}")
+    print(f"\n📈 Report saved to {STUDENT_DIR}/report.json")
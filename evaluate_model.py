@@ -1,38 +1,210 @@
 # evaluate_model.py
+#
+# One batched prediction pass over the test split, cached as
+# .eval_cache/<model sha256>_<dataset fingerprint>.npz (raw scores + labels).
+# Loss, accuracy, classification report, confusion matrix, threshold sweep,
+# ROC/AUC and the plots are all computed from that cache, so re-plotting or
+# trying another threshold never runs the network again.
+#
+#   python evaluate_model.py                    # report + plots
+#   python evaluate_model.py --threshold 0.4    # instant, uses the cache
+#   python evaluate_model.py --refresh          # force a new prediction pass
 import os
+import json
+import pickle
+import argparse
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import (
+    classification_report, confusion_matrix,
+    precision_recall_fscore_support, roc_curve, roc_auc_score
+)
+from fingerprints import file_hash, dataset_fingerprint
 
 # === Paths ===
-BASE_DIR = r"C:\Users\godal\OneDrive\Desktop\miniiiiiii\Drowsy-driver\dataset\Drowsy_datset"
-TEST_DIR = os.path.join(BASE_DIR, "test")
-
-# === Load Model ===
-model = load_model("model.h5")  # or "model.keras" if you saved in new format
-
-# === Prepare Data ===
-test_datagen = ImageDataGenerator(rescale=1.0 / 255)
-test_gen = test_datagen.flow_from_directory(
-    TEST_DIR,
-    target_size=(224, 224),
-    batch_size=32,
-    class_mode="binary",
-    shuffle=False
-)
+MODEL_PATH = "model.h5"
+TEST_DIR = "dataset/Drowsy_datset/test"
+HISTORY_PATH = "history.pkl"
+CACHE_DIR = ".eval_cache"
+EPSILON = 1e-7  # same clipping as Keras' binary_crossentropy
+
+# === Prediction cache ===
+
+def load_predictions(model_path=MODEL_PATH, test_dir=TEST_DIR, batch_size=32, refresh=False):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    key = f"{file_hash(model_path)[:16]}_{dataset_fingerprint(test_dir)[:12]}"
+    cache_path = os.path.join(CACHE_DIR, key + ".npz")
+    if os.path.exists(cache_path) and not refresh:
+        print(f"♻️ Using cached predictions {cache_path}")
+        cached = np.load(cache_path)
+        return {
+            "scores": cached["scores"],
+            "labels": cached["labels"],
+            "class_names": list(cached["class_names"]),
+        }
+
+    # TensorFlow is only needed when the cache is cold
+    from tensorflow.keras.models import load_model
+    import data_pipeline
+
+    model = load_model(model_path)
+    test_data = data_pipeline.make_dataset(test_dir, tuple(model.input_shape[1:3]), batch_size=batch_size)
+    scores = model.predict(test_data.dataset).reshape(-1).astype(np.float32)
+    labels = test_data.labels.astype(np.int32)
+    class_names = list(test_data.class_indices.keys())
+    np.savez_compressed(cache_path, scores=scores, labels=labels, class_names=np.array(class_names))
+    print(f"💾 Predictions cached to {cache_path}")
+    return {"scores": scores, "labels": labels, "class_names": class_names}
+
+# === Metrics (from cached scores only) ===
+
+def binary_loss(scores, labels):
+    p = np.clip(scores, EPSILON, 1 - EPSILON)
+    return float(np.mean(-(labels * np.log(p) + (1 - labels) * np.log(1 - p))))
+
+def threshold_sweep(scores, labels, thresholds=np.linspace(0.05, 0.95, 19)):
+    rows = []
+    for t in thresholds:
+        y_pred = (scores > t).astype(np.int32)
+        precision, recall, f1, _ = precision_recall_fscore_support(
+            labels, y_pred, average="binary", zero_division=0
+        )
+        rows.append({
+            "threshold": round(float(t), 2),
+            "accuracy": float(np.mean(y_pred == labels)),
+            "precision": float(precision),
+            "recall": float(recall),
+            "f1": float(f1),
+        })
+    return rows
+
+# === Plots ===
+
+def plot_confusion_matrix(cm, class_names, path="confusion_matrix_real.png"):
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-GUI backend
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    plt.figure(figsize=(5, 4))
+    sns.heatmap(cm, annot=True, fmt="d", cmap="Blues",
+                xticklabels=class_names,
+                yticklabels=class_names)
+    plt.xlabel("Predicted")
+    plt.ylabel("Actual")
+    plt.title("Confusion Matrix")
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def plot_roc(scores, labels, path="roc_curve.png"):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fpr, tpr, _ = roc_curve(labels, scores)
+    plt.figure(figsize=(5, 4))
+    plt.plot(fpr, tpr, label=f"AUC = {roc_auc_score(labels, scores):.3f}")
+    plt.plot([0, 1], [0, 1], linestyle="--", color="grey")
+    plt.xlabel("False Positive Rate")
+    plt.ylabel("True Positive Rate")
+    plt.title("ROC Curve")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def plot_threshold_sweep(sweep, path="threshold_sweep.png"):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    t = [r["threshold"] for r in sweep]
+    plt.figure(figsize=(6, 4))
+    for metric in ("accuracy", "precision", "recall", "f1"):
+        plt.plot(t, [r[metric] for r in sweep], label=metric.capitalize())
+    plt.xlabel("Threshold")
+    plt.ylabel("Score")
+    plt.title("Threshold Sweep")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def plot_history(history_path=HISTORY_PATH):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    try:
+        with open(history_path, "rb") as f:
+            history_data = pickle.load(f)
+    except FileNotFoundError:
+        print("\n⚠️ 'history.pkl' not found. Rerun training with 'history = model.fit(...)' and save it using pickle.")
+        return
+
+    # Accuracy plot
+    plt.figure(figsize=(6, 4))
+    plt.plot(history_data['accuracy'], label='Training Accuracy')
+    plt.plot(history_data['val_accuracy'], label='Validation Accuracy')
+    plt.xlabel('Epochs')
+    plt.ylabel('Accuracy')
+    plt.title('Training vs Validation Accuracy')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig("accuracy_curve_real.png")
+    plt.close()
+
+    # Loss plot
+    plt.figure(figsize=(6, 4))
+    plt.plot(history_data['loss'], label='Training Loss')
+    plt.plot(history_data['val_loss'], label='Validation Loss')
+    plt.xlabel('Epochs')
+    plt.ylabel('Loss')
+    plt.title('Training vs Validation Loss')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig("loss_curve_real.png")
+    plt.close()
+
+# === Main ===
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the model on the test split from one cached prediction pass.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--test-dir", default=TEST_DIR)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--refresh", action="store_true", help="ignore the cache and predict again")
+    parser.add_argument("--no-plots", action="store_true")
+    args = parser.parse_args()
+
+    preds = load_predictions(args.model, args.test_dir, refresh=args.refresh)
+    scores, y_true, class_names = preds["scores"], preds["labels"], preds["class_names"]
+    y_pred = (scores > args.threshold).astype("int32")
+
+    # === Evaluate ===
+    print(f"\n✅ Test Loss: {binary_loss(scores, y_true):.4f}")
+    print(f"✅ Test Accuracy: {np.mean(y_pred == y_true) * 100:.2f}% (threshold {args.threshold})")
+    print(f"✅ ROC AUC: {roc_auc_score(y_true, scores):.4f}")
+
+    # === Reports ===
+    print("\n📊 Classification Report:")
+    print(classification_report(y_true, y_pred, target_names=class_names))
 
-# === Evaluate ===
-loss, acc = model.evaluate(test_gen)
-print(f"\n✅ Test Accuracy: {acc * 100:.2f}%")
+    print("\n🧩 Confusion Matrix:")
+    cm = confusion_matrix(y_true, y_pred)
+    print(cm)
 
-# === Predictions ===
-y_pred = (model.predict(test_gen) > 0.5).astype("int32")
-y_true = test_gen.classes
+    sweep = threshold_sweep(scores, y_true)
+    best = max(sweep, key=lambda r: r["f1"])
+    print("\n🎚️ Threshold Sweep:")
+    print(f"{'thr':>6}{'acc':>8}{'prec':>8}{'rec':>8}{'f1':>8}")
+    for r in sweep:
+        print(f"{r['threshold']:>6.2f}{r['accuracy']:>8.3f}{r['precision']:>8.3f}{r['recall']:>8.3f}{r['f1']:>8.3f}")
+    print(f"Best F1 {best['f1']:.3f} at threshold {best['threshold']:.2f}")
 
-# === Reports ===
-print("\n📊 Classification Report:")
-print(classification_report(y_true, y_pred, target_names=list(test_gen.class_indices.keys())))
+    with open(os.path.join(CACHE_DIR, "last_report.json"), "w", encoding="utf-8") as f:
+        json.dump({"threshold": args.threshold, "confusion_matrix": cm.tolist(), "sweep": sweep}, f, indent=2)
 
-print("\n🧩 Confusion Matrix:")
-print(confusion_matrix(y_true, y_pred))
+    if not args.no_plots:
+        plot_confusion_matrix(cm, class_names)
+        plot_roc(scores, y_true)
+        plot_threshold_sweep(sweep)
+        plot_history()
+        print("\n🖼️ Plots saved: confusion_matrix_real.png, roc_curve.png, threshold_sweep.png, "
+              "accuracy_curve_real.png, loss_curve_real.png")
@@ -0,0 +1,95 @@
+# Export model.h5 for CPU inference and benchmark every variant.
+#
+#   python export_model.py                 # fp32 / dynamic-range / int8 TFLite
+#   python export_model.py --onnx          # also ONNX (needs tf2onnx + onnxruntime)
+#
+# Writes exports/model_<variant>.<ext> and exports/report.json, and prints a
+# size / latency / throughput / accuracy table against model.h5 on the test split.
+import os
+import json
+import argparse
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+import data_pipeline
+import inference
+
+MODEL_PATH = "model.h5"
+EXPORT_DIR = "exports"
+REPRESENTATIVE_IMAGES = 200
+
+def representative_dataset(img_size, count=REPRESENTATIVE_IMAGES):
+    # calibration batches drawn from the training images, unaugmented
+    split = data_pipeline.make_dataset(data_pipeline.TRAIN_DIR, img_size, batch_size=1, shuffle=True, seed=0)
+    def gen():
+        for x, _ in split.dataset.take(count):
+            yield [x]
+    return gen
+
+def export_tflite(model, variant, img_size, path=None):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(img_size)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    path = path or os.path.join(EXPORT_DIR, f"model_{variant}.tflite")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+    return path
+
+def export_onnx(model):
+    import tf2onnx
+    path = os.path.join(EXPORT_DIR, "model.onnx")
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=path)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export model.h5 to TFLite/ONNX and benchmark the variants.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--onnx", action="store_true")
+    parser.add_argument("--threads", type=int, default=None, help="interpreter threads (default: runtime choice)")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    model = load_model(args.model)
+    img_size = tuple(model.input_shape[1:3])
+
+    variants = {"keras": args.model}
+    for variant in ("fp32", "dynamic", "int8"):
+        variants[variant] = export_tflite(model, variant, img_size)
+        inference.copy_label_map(args.model, variants[variant])
+        print(f"✅ Exported {variants[variant]}")
+    if args.onnx:
+        variants["onnx"] = export_onnx(model)
+        inference.copy_label_map(args.model, variants["onnx"])
+        print(f"✅ Exported {variants['onnx']}")
+
+    test_data = data_pipeline.make_dataset(data_pipeline.TEST_DIR, img_size, batch_size=32)
+    report = {}
+    for variant, path in variants.items():
+        clf = inference.load_classifier(path, num_threads=args.threads)
+        accuracy, _ = inference.evaluate_accuracy(clf, test_data.dataset, test_data.labels)
+        report[variant] = {
+            "path": path,
+            "size_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+            "accuracy": round(accuracy, 4),
+            "latency": inference.benchmark_latency(clf, runs=args.runs, batch_size=1),
+            "throughput": inference.benchmark_latency(clf, runs=max(args.runs // 5, 3), batch_size=32),
+        }
+    for r in report.values():
+        r["accuracy_delta"] = round(r["accuracy"] - report["keras"]["accuracy"], 4)
+
+    with open(os.path.join(EXPORT_DIR, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'variant':<10}{'size MB':>9}{'p50 ms':>9}{'p95 ms':>9}{'img/s@32':>10}{'acc':>8}{'Δacc':>8}")
+    for variant, r in report.items():
+        print(f"{variant:<10}{r['size_mb']:>9}{r['latency']['p50_ms']:>9}{r['latency']['p95_ms']:>9}"
+              f"{r['throughput']['images_per_sec']:>10}{r['accuracy']:>8.4f}{r['accuracy_delta']:>+8.4f}")
+    print("\n📈 Report saved to exports/report.json")
@@ -0,0 +1,75 @@
+# Frozen-backbone feature cache.
+#
+# With every MobileNetV2 layer frozen, an epoch spends nearly all of its time
+# decoding JPEGs and running the backbone just to train the small Dense head.
+# This module runs the backbone once per image (plus K-1 augmented views),
+# stores the pooled embeddings in a memory-mapped .npy file and lets the head
+# train straight from that. The cache key covers the image files (path, size,
+# mtime), the backbone weights and the view/augmentation settings, so any
+# change to either produces a fresh cache and an unchanged setup reuses it.
+import os
+import json
+import hashlib
+import numpy as np
+import data_pipeline
+from fingerprints import dataset_fingerprint
+
+CACHE_DIR = ".feature_cache"
+
+def model_fingerprint(model):
+    h = hashlib.sha1(model.to_json().encode())
+    for w in model.get_weights():
+        h.update(np.ascontiguousarray(w).tobytes())
+    return h.hexdigest()
+
+def cache_key(directory, backbone, img_size, views, augmentation):
+    h = hashlib.sha1()
+    h.update(dataset_fingerprint(directory).encode())
+    h.update(model_fingerprint(backbone).encode())
+    h.update(json.dumps([list(img_size), views, augmentation], sort_keys=True).encode())
+    return h.hexdigest()[:20]
+
+def extract_features(backbone, directory, img_size, batch_size=32, views=1, augmentation=None,
+                     cache_dir=CACHE_DIR):
+    # Returns (features, labels, class_indices). View 0 is the plain image;
+    # views 1..K-1 are random augmentations drawn with `augmentation`.
+    # features is a read-only memmap of shape (N * views, embedding_dim).
+    augmentation = augmentation or {}
+    os.makedirs(cache_dir, exist_ok=True)
+    key = cache_key(directory, backbone, img_size, views, augmentation)
+    feat_path = os.path.join(cache_dir, key + ".features.npy")
+    label_path = os.path.join(cache_dir, key + ".labels.npy")
+    meta_path = os.path.join(cache_dir, key + ".json")
+
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        print(f"♻️ Reusing feature cache {key} for {directory}")
+        return np.load(feat_path, mmap_mode="r"), np.load(label_path), meta["class_indices"]
+
+    dim = backbone.output_shape[-1]
+    features = labels = class_indices = None
+    tmp_path = feat_path + ".tmp.npy"
+    for view in range(views):
+        # view 0 is the plain image, the rest are augmented with `augmentation`
+        split = data_pipeline.make_dataset(
+            directory, img_size, batch_size,
+            augment=augmentation if view > 0 else False
+        )
+        n = len(split.labels)
+        if features is None:
+            class_indices = split.class_indices
+            features = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(n * views, dim))
+            labels = np.tile(split.labels, views)
+        print(f"🧠 Extracting view {view + 1}/{views} ({n} images)")
+        features[view * n:(view + 1) * n] = backbone.predict(split.dataset, verbose=1)
+    features.flush()
+    del features
+
+    # the .json is written last and marks the cache as complete
+    os.replace(tmp_path, feat_path)
+    np.save(label_path, labels)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"directory": directory, "samples": n, "views": views,
+                   "class_indices": class_indices}, f)
+    return np.load(feat_path, mmap_mode="r"), labels, class_indices
@@ -0,0 +1,24 @@
+# Identity of the artifacts that caches and reports are keyed on. Shared by
+# feature_cache.py, evaluate_model.py and rescore.py so they always agree on
+# which dataset / model they describe; no TensorFlow import.
+import os
+import hashlib
+
+def file_hash(path):
+    # sha256 of the file contents, streamed
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def dataset_fingerprint(directory):
+    # cheap: relative path, size and mtime of every file, not the contents
+    h = hashlib.sha1()
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            h.update(f"{os.path.relpath(path, directory)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
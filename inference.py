@@ -0,0 +1,188 @@
+# One interface over every model artifact we ship:
+#     model.h5 / *.keras   full-precision Keras model
+#     *.tflite             TFLite export (float, dynamic-range or full-int8)
+#     *.onnx               ONNX export (needs onnxruntime)
+#
+#   clf = load_classifier("model_int8.tflite")
+#   scores = clf.predict(batch)   # batch: float32 NHWC in [0, 1], scores: (N,)
+#   drowsy = clf.drowsy_scores(batch)   # same, oriented so higher = drowsier
+#
+# The TFLite path prefers the small `tflite_runtime` wheel used on in-cab
+# hardware and falls back to TensorFlow's bundled interpreter.
+#
+# The sigmoid output is P(class 1) for the class order the model was trained
+# with. That order is saved next to every artifact as <name>.labels.json,
+#     {"class_indices": {"Drowsy": 0, "Non Drowsy": 1}}
+# (train_model.py writes it, export_model.py / distill.py copy it), and
+# load_classifier() refuses an artifact without one.
+import os
+import json
+import time
+import shutil
+import numpy as np
+
+DROWSY_CLASS = "drowsy"  # class folder name, case-insensitive
+
+def label_map_path(model_path):
+    return os.path.splitext(model_path)[0] + ".labels.json"
+
+def save_label_map(model_path, class_indices):
+    with open(label_map_path(model_path), "w", encoding="utf-8") as f:
+        json.dump({"class_indices": {name: int(i) for name, i in class_indices.items()}}, f, indent=2)
+
+def copy_label_map(src_model, dst_model):
+    if label_map_path(src_model) != label_map_path(dst_model):
+        shutil.copyfile(label_map_path(src_model), label_map_path(dst_model))
+
+def drowsy_class_index(model_path):
+    path = label_map_path(model_path)
+    try:
+        with open(path, encoding="utf-8") as f:
+            class_indices = json.load(f).get("class_indices")
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"{path} not found, so the class order of {model_path} is unknown; write the training "
+            f'class_indices there, e.g. {{"class_indices": {{"Drowsy": 0, "Non Drowsy": 1}}}}'
+        ) from None
+    if not isinstance(class_indices, dict) or sorted(class_indices.values()) != [0, 1]:
+        raise ValueError(f"{path}: class_indices must map two class names to 0 and 1")
+    matches = [i for name, i in class_indices.items() if name.lower() == DROWSY_CLASS]
+    if len(matches) != 1:
+        raise ValueError(f"{path}: no class named {DROWSY_CLASS!r} in {sorted(class_indices)}")
+    return matches[0]
+
+class Classifier:
+    input_size = (224, 224)
+    # set from the artifact's label map by load_classifier()
+    drowsy_class_index = None
+
+    def predict(self, batch):
+        raise NotImplementedError
+
+    def drowsy_scores(self, batch):
+        if self.drowsy_class_index is None:
+            raise RuntimeError("class order unknown: load the model with load_classifier()")
+        scores = self.predict(batch)
+        return 1.0 - scores if self.drowsy_class_index == 0 else scores
+
+    def preprocess(self, image):
+        # uint8 RGB frame of any size -> float32 (H, W, 3) in [0, 1], using
+        # the same nearest-neighbour resize as the training pipeline
+        h, w = self.input_size
+        rows = (np.arange(h) * image.shape[0] // h).astype(np.intp)
+        cols = (np.arange(w) * image.shape[1] // w).astype(np.intp)
+        return image[rows][:, cols, :3].astype(np.float32) / 255.0
+
+class KerasClassifier(Classifier):
+    def __init__(self, path):
+        from tensorflow.keras.models import load_model
+        self.model = load_model(path)
+        self.input_size = tuple(self.model.input_shape[1:3])
+
+    def predict(self, batch):
+        return self.model.predict_on_batch(np.asarray(batch, dtype=np.float32)).reshape(-1)
+
+class TFLiteClassifier(Classifier):
+    # Resizing the input tensor reallocates the whole interpreter, and the
+    # micro-batcher flushes a different batch size almost every time. Batches
+    # are padded up to the next power of two instead, with one interpreter
+    # allocated per padded size, so a handful of shapes serve every batch.
+    def __init__(self, path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self._new_interpreter = lambda: Interpreter(model_path=path, num_threads=num_threads)
+        self._runners = {}  # padded batch size -> (interpreter, input, output)
+        interpreter = self._new_interpreter()
+        interpreter.allocate_tensors()
+        self.input = interpreter.get_input_details()[0]
+        self.output = interpreter.get_output_details()[0]
+        self.input_size = tuple(self.input["shape"][1:3])
+        self._runners[int(self.input["shape"][0])] = (interpreter, self.input, self.output)
+
+    @staticmethod
+    def padded_size(n):
+        return 1 << (n - 1).bit_length()
+
+    def _runner(self, size):
+        runner = self._runners.get(size)
+        if runner is None:
+            h, w = self.input_size
+            interpreter = self._new_interpreter()
+            interpreter.resize_tensor_input(self.input["index"], [size, h, w, 3])
+            interpreter.allocate_tensors()
+            runner = (interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0])
+            self._runners[size] = runner
+        return runner
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        n = len(batch)
+        size = n if n in self._runners else self.padded_size(n)
+        interpreter, inp, out_detail = self._runner(size)
+        if size > n:
+            batch = np.concatenate([batch, np.zeros((size - n,) + batch.shape[1:], dtype=np.float32)])
+        # full-int8 models take and return quantized tensors
+        if inp["dtype"] != np.float32:
+            scale, zero = inp["quantization"]
+            info = np.iinfo(inp["dtype"])
+            batch = np.clip(np.round(batch / scale + zero), info.min, info.max).astype(inp["dtype"])
+        interpreter.set_tensor(inp["index"], batch)
+        interpreter.invoke()
+        out = interpreter.get_tensor(out_detail["index"])[:n]
+        if out_detail["dtype"] != np.float32:
+            scale, zero = out_detail["quantization"]
+            out = (out.astype(np.float32) - zero) * scale
+        return out.reshape(-1)
+
+class ONNXClassifier(Classifier):
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_size = tuple(self.session.get_inputs()[0].shape[1:3])
+
+    def predict(self, batch):
+        out = self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+        return out.reshape(-1)
+
+def load_classifier(path, num_threads=None):
+    drowsy_index = drowsy_class_index(path)  # before loading anything heavy
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".tflite":
+        clf = TFLiteClassifier(path, num_threads)
+    elif ext == ".onnx":
+        clf = ONNXClassifier(path, num_threads)
+    else:
+        clf = KerasClassifier(path)
+    clf.drowsy_class_index = drowsy_index
+    return clf
+
+# ---------------- BENCHMARK ---------------- #
+
+def benchmark_latency(classifier, runs=50, batch_size=1, warmup=5):
+    h, w = classifier.input_size
+    batch = np.random.rand(batch_size, h, w, 3).astype(np.float32)
+    for _ in range(warmup):
+        classifier.predict(batch)
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        classifier.predict(batch)
+        times.append(time.perf_counter() - started)
+    times = np.asarray(times) * 1000
+    return {
+        "batch_size": batch_size,
+        "p50_ms": round(float(np.percentile(times, 50)), 2),
+        "p95_ms": round(float(np.percentile(times, 95)), 2),
+        "images_per_sec": round(batch_size * 1000 / float(np.mean(times)), 1),
+    }
+
+def evaluate_accuracy(classifier, dataset, labels, threshold=0.5):
+    # dataset yields (images, labels) batches, e.g. data_pipeline.make_dataset(...).dataset
+    scores = np.concatenate([classifier.predict(x.numpy()) for x, _ in dataset])
+    return float(np.mean((scores > threshold).astype(np.float32) == labels)), scores
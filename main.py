@@ -1,29 +1,62 @@
 import time
 import sqlite3
 import os
+import io
 import json
+import atexit
+import scores
+import ingest
+import db_pool
+import write_behind
+import thumbnails
+import blobstore
+import analytics
+import batcher
+import pubsub
+import metrics
+import directory
 from flask import (
     Flask, render_template, request, redirect,
     url_for, session, send_from_directory,
-    flash, jsonify
+    flash, jsonify, g, has_app_context, send_file, abort,
+    Response, stream_with_context
 )
 
 DB_PATH = "drivers.db"
 ACTIVE_FILE = "current_driver.json"
 RECORDS_DIR = "records"
+THUMB_CACHE_DIR = os.environ.get("THUMB_CACHE_DIR", ".thumb_cache")
+THUMB_CACHE_BYTES = int(os.environ.get("THUMB_CACHE_MB", "256")) * 1024 * 1024
+# snapshot files are never rewritten under the same name
+RECORDS_MAX_AGE = 30 * 24 * 60 * 60
 
 app = Flask(__name__)
 app.secret_key = "change-me"  # change later in production
 
 os.makedirs(RECORDS_DIR, exist_ok=True)
+thumbs = thumbnails.ThumbnailCache(RECORDS_DIR, THUMB_CACHE_DIR, max_bytes=THUMB_CACHE_BYTES)
 
 # ---------------- DATABASE ---------------- #
 
+pool = db_pool.ConnectionPool(DB_PATH, size=int(os.environ.get("DB_POOL_SIZE", "8")))
+# per-route latency, SQLite time per request, /metrics (see metrics.py)
+metrics.instrument(app, pool)
+
 def db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    # pooled per worker process; conn.close() returns it to the pool
+    conn = pool.acquire()
+    if has_app_context():
+        g.setdefault("db_conns", []).append((conn, conn.lease))
     return conn
 
+@app.teardown_appcontext
+def release_db(exc):
+    # safety net for routes that raised before closing their connection
+    # only checkouts this request still owns; a closed one may already be
+    # back in use by another request or the write-behind flusher
+    for conn, lease in g.pop("db_conns", []):
+        pool.release(conn, lease)
+
 def init_db():
     conn = db()
     c = conn.cursor()
@@ -35,15 +68,15 @@ def init_db():
             email TEXT
         );
     """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS events(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            driver_id INTEGER,
-            event_type TEXT,
-            ts TEXT,
-            image_path TEXT
-        );
-    """)
+    migrated = ingest.init_events(conn)
+    scores.init_score_tables(conn)
+    blobstore.init_blob_tables(conn)
+    analytics.init_analytics_tables(conn)
+    directory.init_directory_index(conn)
+    if migrated:
+        # legacy timestamps were invisible to the old parser, recount them
+        scores.rebuild_scores(conn)
+        analytics.rebuild_rollups(conn)
     conn.commit()
     conn.close()
 
@@ -80,6 +113,7 @@ def register():
                 (name, license_number, email)
             )
             conn.commit()
+            drivers_dir.invalidate()
             flash("Registration successful. Please login.", "success")
             return redirect(url_for("login"))
         except sqlite3.IntegrityError:
@@ -121,27 +155,11 @@ def logout():
 # ---------------- SAFETY SCORE ---------------- #
 
 def safety_percent_for(driver_id):
+    # read from the aggregates maintained by insert_events(); see scores.py
     conn = db()
-    c = conn.cursor()
-    c.execute("SELECT ts FROM events WHERE driver_id=?", (driver_id,))
-    timestamps = [row["ts"] for row in c.fetchall()]
+    result = scores.safety_score(conn, driver_id)
     conn.close()
-
-    now = time.time()
-    score_raw = 0.0
-
-    for ts in timestamps:
-        try:
-            event_time = time.mktime(time.strptime(ts, "%Y-%m-%d %H:%M:%S"))
-            days_ago = (now - event_time) / (60 * 60 * 24)
-            weight = max(0.0, 1.0 - days_ago / 30.0)
-            score_raw += weight
-        except:
-            continue
-
-    max_score = 30.0
-    score = max(0.0, 100.0 * (1.0 - score_raw / max_score))
-    return round(score, 1), len(timestamps), round(score_raw, 1)
+    return result
 
 # ---------------- DASHBOARD ---------------- #
 
@@ -156,20 +174,26 @@ def dashboard():
     conn = db()
     c = conn.cursor()
     c.execute(
-        "SELECT * FROM events WHERE driver_id=? ORDER BY id DESC LIMIT 50",
-        (driver_id,)
+        "SELECT * FROM events WHERE driver_id=? ORDER BY id DESC LIMIT ?",
+        (driver_id, EVENTS_PAGE_SIZE)
     )
     events = c.fetchall()
     safety, total_events, weighted_events = safety_percent_for(driver_id)
     conn.close()
 
+    # older pages are fetched from /api/drivers/<id>/events by the template
+    next_before_id = events[-1]["id"] if len(events) == EVENTS_PAGE_SIZE else None
+
     return render_template(
         "dashboard.html",
         name=driver_name,
         safety=safety,
         total_events=total_events,
         weighted_events=weighted_events,
-        events=events
+        events=events,
+        driver_id=driver_id,
+        next_before_id=next_before_id,
+        page_size=EVENTS_PAGE_SIZE
     )
 
 @app.route("/passenger", methods=["GET", "POST"])
@@ -179,8 +203,6 @@ def passenger():
 
     conn = db()
     c = conn.cursor()
-    c.execute("SELECT id, name FROM drivers")
-    all_drivers = c.fetchall()
 
     if request.method == "POST":
         driver_id = request.form.get("driver_id", "").strip()
@@ -211,32 +233,570 @@ def passenger():
         "passenger.html",
         data=data,
         error=error,
-        all_drivers=all_drivers
+        driver_count=drivers_dir.count(db)
     )
 
 @app.route("/records/<path:filename>")
 def records_static(filename):
-    return send_from_directory(RECORDS_DIR, filename)
-
-# ---------------- API FOR DETECTION CLIENT ---------------- #
+    # send_from_directory answers If-None-Match / If-Modified-Since with 304
+    return send_from_directory(RECORDS_DIR, filename, max_age=RECORDS_MAX_AGE)
+
+@app.route("/thumbs/<path:filename>")
+def records_thumb(filename):
+    try:
+        found = thumbs.get(filename, request.args.get("w", type=int))
+    except thumbnails.UnrenderableImage:
+        abort(415)
+    if found is None:
+        abort(404)
+    path, etag = found
+    return send_file(
+        path,
+        mimetype="image/jpeg",
+        etag=etag,
+        conditional=True,
+        max_age=RECORDS_MAX_AGE
+    )
 
-@app.route("/api/event", methods=["POST"])
-def api_event():
-    data = request.json
+@app.template_filter("thumb")
+def thumb_url(image_path, width=160):
+    # events.image_path is stored as records/1/x.jpg or records\1\x.jpg
+    path = image_path.replace("\\", "/")
+    if path.startswith(RECORDS_DIR + "/"):
+        path = path[len(RECORDS_DIR) + 1:]
+    return url_for("records_thumb", filename=path, w=width)
+
+# ---------------- DRIVER DIRECTORY ---------------- #
+
+drivers_dir = directory.DriverDirectory(ttl=float(os.environ.get("DIRECTORY_TTL", "60")))
+
+@app.route("/api/drivers/search")
+def api_drivers_search():
+    # typeahead for the passenger page: name prefix (case-insensitive) or exact id
+    limit = request.args.get("limit", 10, type=int)
+    return jsonify({"drivers": drivers_dir.search(db, request.args.get("q", ""), limit)})
+
+# ---------------- EVENT HISTORY API ---------------- #
+
+EVENTS_PAGE_SIZE = 50
+MAX_EVENTS_PAGE_SIZE = 500
+EVENT_COLUMNS = ("id", "driver_id", "event_type", "ts", "ts_epoch", "image_path",
+                 "episode_start", "episode_end", "peak_score")
+
+def epoch_arg(name):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    epoch = scores.parse_ts(value)
+    if epoch is None:
+        raise ValueError(f"{name}: unrecognised timestamp {value!r}")
+    return int(epoch)
+
+@app.route("/api/drivers/<int:driver_id>/events")
+def api_driver_events(driver_id):
+    # Keyset pagination on id: pass the previous page's next_before_id as
+    # before_id. Each page is an index range scan on (driver_id, id), however
+    # far back it is.
+    limit = min(max(request.args.get("limit", EVENTS_PAGE_SIZE, type=int), 1), MAX_EVENTS_PAGE_SIZE)
+    fields = [f for f in request.args.get("fields", "").split(",") if f] or list(EVENT_COLUMNS)
+    unknown = [f for f in fields if f not in EVENT_COLUMNS]
+    if unknown:
+        return jsonify({"status": "error", "error": "unknown field(s): " + ", ".join(unknown)}), 400
+    try:
+        since, until = epoch_arg("since"), epoch_arg("until")
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+
+    where, params = ["driver_id=?"], [driver_id]
+    before_id = request.args.get("before_id", type=int)
+    if before_id is not None:
+        where.append("id < ?")
+        params.append(before_id)
+    event_types = [t for t in request.args.get("event_type", "").split(",") if t]
+    if event_types:
+        where.append("event_type IN (%s)" % ",".join("?" * len(event_types)))
+        params.extend(event_types)
+    if since is not None:
+        where.append("ts_epoch >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("ts_epoch < ?")
+        params.append(until)
+
+    columns = fields if "id" in fields else ["id"] + fields
     conn = db()
     c = conn.cursor()
     c.execute(
-        "INSERT INTO events(driver_id, event_type, ts, image_path) VALUES (?,?,?,?)",
-        (
-            data["driver_id"],
-            data["event_type"],
-            data["ts"],
-            data.get("image_path")
-        )
+        "SELECT %s FROM events WHERE %s ORDER BY id DESC LIMIT ?" % (", ".join(columns), " AND ".join(where)),
+        params + [limit + 1]
     )
-    conn.commit()
+    rows = c.fetchall()
     conn.close()
-    return jsonify({"status": "ok"})
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    events = []
+    for row in rows:
+        event = {f: row[f] for f in fields}
+        if "image_path" in fields and row["image_path"]:
+            event["thumb_url"] = thumb_url(row["image_path"])
+        events.append(event)
+
+    return jsonify({
+        "events": events,
+        "next_before_id": rows[-1]["id"] if has_more else None
+    })
+
+# ---------------- FLEET ANALYTICS ---------------- #
+
+DEFAULT_ANALYTICS_DAYS = 30
+
+@app.route("/api/analytics")
+def api_analytics():
+    # view=top         top-N drivers by event count in [since, until)
+    # view=timeseries  event counts per hour/day, optionally per driver/type
+    try:
+        until = epoch_arg("until") or int(time.time())
+        since = epoch_arg("since") or until - DEFAULT_ANALYTICS_DAYS * 24 * 60 * 60
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    event_types = [t for t in request.args.get("event_type", "").split(",") if t] or None
+    granularity = request.args.get("granularity")
+    if granularity is not None and granularity not in analytics.GRANULARITIES:
+        return jsonify({"status": "error", "error": "granularity must be hour or day"}), 400
+    group_by = request.args.get("group_by") or None
+    if group_by is not None and group_by not in analytics.GROUP_BY:
+        return jsonify({"status": "error", "error": "group_by must be event_type or driver_id"}), 400
+
+    view = request.args.get("view", "top")
+    if view == "top":
+        granularity = granularity or analytics.top_granularity(since, until)
+    elif view == "timeseries":
+        granularity = granularity or "hour"
+    else:
+        return jsonify({"status": "error", "error": "view must be top or timeseries"}), 400
+    started = time.perf_counter()
+    conn = db()
+    try:
+        if view == "top":
+            limit = min(max(request.args.get("n", 10, type=int), 1), 1000)
+            result = analytics.top_drivers(conn, since, until, limit, event_types, granularity)
+        else:
+            result = analytics.timeseries(
+                conn, since, until,
+                granularity=granularity,
+                driver_id=request.args.get("driver_id", type=int),
+                event_types=event_types,
+                group_by=group_by
+            )
+    finally:
+        conn.close()
+
+    # counts are per whole bucket: report the window they actually cover
+    window_since, window_until = analytics.aligned_window(granularity, since, until)
+    return jsonify({
+        "view": view,
+        "since": since,
+        "until": until,
+        "granularity": granularity,
+        "window_since": window_since,
+        "window_until": window_until,
+        "query_ms": round((time.perf_counter() - started) * 1000, 2),
+        "data": result
+    })
+
+# ---------------- EVENT INGEST ---------------- #
+
+def record_inserted(conn, rows, ids):
+    # derived tables, kept in the insert's transaction (see ingest.insert_events)
+    scores.record_events(conn, rows)
+    analytics.record_events(conn, rows)
+    blobstore.link_events(conn, list(zip(ids, (row[3] for row in rows))))
+
+def insert_events(conn, rows):
+    return ingest.insert_events(conn, rows, on_insert=record_inserted)
+
+# ---------------- LIVE FEED ---------------- #
+
+# /stream/events pushes new events and score updates to open dashboards over
+# Server-Sent Events. Each stream occupies a worker thread, so the number of
+# streams per worker is capped (STREAM_MAX_CLIENTS).
+STREAM_HEARTBEAT = 15  # seconds; keeps proxies from closing idle streams
+STREAM_REPLAY_PAGE = 500
+broker = pubsub.Broker(
+    max_subscribers=int(os.environ.get("STREAM_MAX_CLIENTS", "50"))
+)
+
+def publish_stored(conn, rows, stored):
+    # called after commit with insert_events()' result
+    ids, duplicates = stored
+    drivers = set()
+    for i, (row, event_id) in enumerate(zip(rows, ids)):
+        if i in duplicates:
+            continue
+        drivers.add(row[0])
+        broker.publish({"id": event_id, "event": "event", "data": {
+            "id": event_id, "driver_id": row[0], "event_type": row[1], "ts": row[2],
+            "image_path": row[3], "peak_score": row[7]
+        }}, topic=row[0])
+    # scores are cheap (aggregate tables) but only worth reading if someone listens
+    if broker.has_subscribers():
+        for driver_id in drivers:
+            broker.publish({"id": None, "event": "score", "data": score_payload(conn, driver_id)}, topic=driver_id)
+
+def score_payload(conn, driver_id):
+    safety, total_events, weighted_events = scores.safety_score(conn, driver_id)
+    return {"driver_id": driver_id, "safety": safety,
+            "total_events": total_events, "weighted_events": weighted_events}
+
+def sse(message):
+    data = message["data"]
+    if message["event"] == "event" and data.get("image_path"):
+        data = dict(data, thumb_url=thumb_url(data["image_path"]))
+    lines = [f"id: {message['id']}"] if message.get("id") is not None else []
+    lines += [f"event: {message['event']}", "data: " + json.dumps(data), "", ""]
+    return "\n".join(lines)
+
+def replay_from_db(driver_id, last_id):
+    # every event after last_id, a page at a time (idx_events_driver_id);
+    # the connection is only held while a page is read
+    while True:
+        conn = db()
+        try:
+            rows = conn.execute(
+                "SELECT id, driver_id, event_type, ts, image_path, peak_score FROM events "
+                "WHERE driver_id = ? AND id > ? ORDER BY id LIMIT ?", (driver_id, last_id, STREAM_REPLAY_PAGE)
+            ).fetchall()
+        finally:
+            conn.close()
+        for r in rows:
+            yield {"id": r["id"], "event": "event", "data": dict(r)}
+        if len(rows) < STREAM_REPLAY_PAGE:
+            return
+        last_id = rows[-1]["id"]
+
+@app.route("/stream/events")
+def stream_events():
+    # The logged-in driver's own events, like /dashboard. Reconnects send
+    # Last-Event-ID and get what they missed.
+    if "driver_id" not in session:
+        return jsonify({"status": "error", "error": "login required"}), 401
+    driver_id = session["driver_id"]
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+    try:
+        sub = broker.subscribe(driver_id)
+    except pubsub.TooManySubscribers:
+        return jsonify({"status": "error", "error": "too many live streams"}), 503, {"Retry-After": "10"}
+
+    conn = db()
+    try:
+        initial_score = score_payload(conn, driver_id)
+    finally:
+        conn.close()
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            # an event stored after subscribe() arrives live and is also in
+            # the replay; ids are assigned in commit order, so send it once
+            replayed = last_id or 0
+            if last_id is not None:
+                for message in replay_from_db(driver_id, last_id):
+                    replayed = message["id"]
+                    yield sse(message)
+            yield sse({"event": "score", "data": initial_score})
+            while True:
+                messages = sub.get(STREAM_HEARTBEAT)
+                if sub.lagged:
+                    # too far behind: let the client reconnect and replay
+                    yield sse({"event": "reset", "data": {}})
+                    return
+                if not messages:
+                    yield ": heartbeat\n\n"
+                for message in messages:
+                    if message.get("id") is not None and message["id"] <= replayed:
+                        continue
+                    yield sse(message)
+        finally:
+            sub.close()
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/stream/stats")
+def stream_stats():
+    return jsonify(broker.stats())
+
+# ---------------- WRITE-BEHIND ---------------- #
+
+# EVENT_WRITE_BEHIND=1 acknowledges ingest requests as soon as the events are
+# queued; a background thread group-commits them. Off by default.
+WRITE_BEHIND = os.environ.get("EVENT_WRITE_BEHIND") == "1"
+
+def flush_events(rows):
+    conn = db()
+    try:
+        stored = insert_events(conn, rows)
+        conn.commit()
+        publish_stored(conn, rows, stored)
+    finally:
+        conn.close()
+    return len(rows) - len(stored[1])
+
+event_queue = None
+if WRITE_BEHIND:
+    event_queue = write_behind.WriteBehindQueue(
+        flush_events,
+        max_size=int(os.environ.get("EVENT_QUEUE_SIZE", "10000")),
+        flush_interval=int(os.environ.get("EVENT_FLUSH_MS", "50")) / 1000.0,
+        flush_batch=int(os.environ.get("EVENT_FLUSH_ROWS", "500"))
+    )
+    atexit.register(event_queue.stop)
+
+def queue_full_response():
+    return (
+        jsonify({"status": "error", "error": "ingest queue full, retry later"}),
+        503,
+        {"Retry-After": "1"}
+    )
+
+def store_events(rows):
+    # returns (ids, duplicates) as insert_events() does, or None when
+    # write-behind queued the rows (replays are then deduped at flush time);
+    # raises write_behind.QueueFull when the queue cannot take them
+    if event_queue is not None:
+        event_queue.submit(rows)
+        metrics.record_ingest(len(rows))
+        return None
+    conn = db()
+    try:
+        stored = insert_events(conn, rows)
+        conn.commit()
+        metrics.record_ingest(len(rows) - len(stored[1]))
+        publish_stored(conn, rows, stored)
+    finally:
+        conn.close()
+    return stored
+
+def batch_response(results, rows, row_index, stored, elapsed, label):
+    if stored is None:
+        for i in row_index:
+            results[i]["status"] = "queued"
+    else:
+        ids, duplicates = stored
+        for n, (i, event_id) in enumerate(zip(row_index, ids)):
+            results[i]["id"] = event_id
+            if n in duplicates:
+                results[i]["status"] = "duplicate"
+
+    rows_per_sec = round(len(rows) / elapsed, 1) if elapsed > 0 else None
+    app.logger.info("%s: %d rows in %.1f ms (%s rows/s)",
+                    label, len(rows), elapsed * 1000, rows_per_sec)
+
+    return jsonify({
+        "status": "ok" if len(rows) == len(results) else "partial",
+        "accepted": len(rows),
+        "rejected": len(results) - len(rows),
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "rows_per_sec": rows_per_sec,
+        "results": results
+    }), 202 if stored is None else 200
+
+# ---------------- SNAPSHOT UPLOAD ---------------- #
+
+MAX_SNAPSHOT_BYTES = 10 * 1024 * 1024
+# whole request body, multipart included; Werkzeug answers 413 beyond it
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "64")) * 1024 * 1024
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+blobs = blobstore.BlobStore(RECORDS_DIR)
+
+@app.errorhandler(413)
+def request_too_large(exc):
+    return jsonify({"status": "error", "error": f"request larger than {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+def save_snapshot(stream):
+    # chunked copy into the content-addressed store (temp file + rename)
+    digest, size, _ = blobs.put_stream(stream, max_bytes=MAX_SNAPSHOT_BYTES, verify=True)
+    return digest, size, blobs.image_path(digest)
+
+def replayed_keys(keys):
+    # idempotency key -> (id, image_path) of the stored event, checked before
+    # any snapshot is written so a retried upload does not store its JPEG again
+    keys = {k for k in keys if k is not None}
+    if not keys:
+        return {}
+    conn = db()
+    try:
+        return ingest.replayed_events(conn, keys)
+    finally:
+        conn.close()
+
+def record_snapshots(saved):
+    if not saved:
+        return
+    conn = db()
+    try:
+        for digest, size in saved:
+            blobs.record(conn, digest, size)
+        conn.commit()
+    finally:
+        conn.close()
+
+# ---------------- API FOR DETECTION CLIENT ---------------- #
+
+@app.route("/api/event", methods=["POST"])
+def api_event():
+    item = request.get_json(silent=True)
+    if isinstance(item, dict) and request.headers.get("Idempotency-Key"):
+        item.setdefault("idempotency_key", request.headers["Idempotency-Key"])
+    row, error = ingest.validate_event(item)
+    if error:
+        return jsonify({"status": "error", "error": error}), 400
+    try:
+        stored = store_events([row])
+    except write_behind.QueueFull:
+        return queue_full_response()
+    if stored is None:
+        return jsonify({"status": "queued"}), 202
+    ids, duplicates = stored
+    return jsonify({"status": "duplicate" if duplicates else "ok", "id": ids[0]})
+
+@app.route("/api/events/batch", methods=["POST"])
+def api_events_batch():
+    items = ingest.parse_batch_body(request)
+    if items is None:
+        return jsonify({"status": "error", "error": "expected a JSON array or NDJSON body"}), 400
+    if len(items) > ingest.MAX_BATCH_EVENTS:
+        return jsonify({"status": "error", "error": f"batch larger than {ingest.MAX_BATCH_EVENTS} events"}), 413
+
+    results = []
+    rows, row_index = [], []
+    for i, item in enumerate(items):
+        row, error = ingest.validate_event(item)
+        if error:
+            results.append({"index": i, "status": "error", "error": error})
+        else:
+            results.append({"index": i, "status": "ok"})
+            rows.append(row)
+            row_index.append(i)
+
+    started = time.perf_counter()
+    try:
+        stored = store_events(rows)
+    except write_behind.QueueFull:
+        return queue_full_response()
+    return batch_response(results, rows, row_index, stored, time.perf_counter() - started, "batch ingest")
+
+@app.route("/api/event/upload", methods=["POST"])
+def api_event_upload():
+    # Raw JPEG body, event fields in the query string:
+    #   POST /api/event/upload?driver_id=1&event_type=drowsiness&ts=...
+    item = {k: request.args.get(k) for k in ingest.REQUIRED_EVENT_FIELDS + ingest.EPISODE_FIELDS}
+    item["idempotency_key"] = request.headers.get("Idempotency-Key") or request.args.get("idempotency_key")
+    row, error = ingest.validate_event(item)
+    if error:
+        return jsonify({"status": "error", "error": error}), 400
+    replayed = replayed_keys([row[8]])
+    if row[8] in replayed:
+        event_id, image_path = replayed[row[8]]
+        return jsonify({"status": "duplicate", "id": event_id, "image_path": image_path})
+    try:
+        digest, size, image_path = save_snapshot(request.stream)
+    except blobstore.InvalidImage as e:
+        return jsonify({"status": "error", "error": str(e)}), 415
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 413
+    record_snapshots([(digest, size)])
+
+    row = row[:3] + (image_path,) + row[4:]
+    try:
+        stored = store_events([row])
+    except write_behind.QueueFull:
+        return queue_full_response()
+    if stored is None:
+        return jsonify({"status": "queued", "image_path": image_path}), 202
+    ids, duplicates = stored
+    return jsonify({"status": "duplicate" if duplicates else "ok", "id": ids[0], "image_path": image_path})
+
+@app.route("/api/events/upload", methods=["POST"])
+def api_events_upload():
+    # multipart/form-data: an `events` field holding a JSON array, plus one
+    # file part per snapshot; an event names its part with "image": "<field>".
+    # Werkzeug spools each part to a temp file, so memory use stays bounded.
+    try:
+        items = json.loads(request.form.get("events", ""))
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        return jsonify({"status": "error", "error": "expected an `events` JSON array field"}), 400
+    if len(items) > ingest.MAX_BATCH_EVENTS:
+        return jsonify({"status": "error", "error": f"batch larger than {ingest.MAX_BATCH_EVENTS} events"}), 413
+
+    started = time.perf_counter()
+    results, rows, row_index, saved = ingest.collect_uploads(items, request.files, save_snapshot, replayed_keys)
+    record_snapshots(saved)
+    try:
+        stored = store_events(rows)
+    except write_behind.QueueFull:
+        return queue_full_response()
+    return batch_response(results, rows, row_index, stored, time.perf_counter() - started, "upload ingest")
+
+@app.route("/api/ingest/stats")
+def api_ingest_stats():
+    if event_queue is None:
+        return jsonify({"write_behind": False})
+    return jsonify(dict(event_queue.stats(), write_behind=True))
+
+# ---------------- CLASSIFY ---------------- #
+
+# For cabs too weak to run the model: POST a frame, get the drowsy score back.
+# The model is loaded lazily once per worker process (and warmed up);
+# concurrent requests share forward passes through the micro-batcher.
+CLASSIFY_MODEL = os.environ.get("CLASSIFY_MODEL", "model.h5")
+
+def load_classify_model():
+    import inference
+    threads = int(os.environ.get("CLASSIFY_THREADS", "0")) or None
+    return inference.load_classifier(CLASSIFY_MODEL, num_threads=threads)
+
+classifier = batcher.MicroBatcher(
+    load_classify_model,
+    max_batch=int(os.environ.get("CLASSIFY_MAX_BATCH", "16")),
+    max_wait=int(os.environ.get("CLASSIFY_MAX_WAIT_MS", "5")) / 1000.0,
+    max_queue=int(os.environ.get("CLASSIFY_QUEUE_SIZE", "256"))
+)
+
+@app.route("/api/classify", methods=["POST"])
+def api_classify():
+    # multipart field "image", or the raw JPEG/PNG as the request body
+    upload = request.files.get("image")
+    if upload is None and (request.content_length or 0) > MAX_SNAPSHOT_BYTES:
+        return jsonify({"status": "error", "error": "image too large"}), 413
+    try:
+        image = batcher.decode_image(upload.stream if upload else io.BytesIO(request.get_data()))
+    except Exception:
+        return jsonify({"status": "error", "error": "could not decode image"}), 400
+    threshold = request.args.get("threshold", 0.5, type=float)
+    try:
+        result = classifier.predict(image)
+    except batcher.BatcherBusy:
+        return jsonify({"status": "error", "error": "classifier busy, retry later"}), 503, {"Retry-After": "1"}
+    except TimeoutError as e:
+        return jsonify({"status": "error", "error": str(e)}), 504
+    except (OSError, ImportError) as e:
+        return jsonify({"status": "error", "error": f"classifier unavailable: {e}"}), 503
+    return jsonify({
+        "status": "ok",
+        "drowsy_score": round(result.score, 4),
+        "drowsy": result.score >= threshold,
+        "batch_size": result.batch_size,
+        "queue_ms": round(result.queue_seconds * 1000, 2)
+    })
+
+@app.route("/api/classify/stats")
+def api_classify_stats():
+    return jsonify(classifier.stats())
 
 # ---------------- RUN ---------------- #
 
@@ -0,0 +1,87 @@
+import threading
+from collections import deque
+
+# In-process pub/sub for the live dashboard feed. The ingest path publishes
+# each stored event (and the driver's new score); every open /stream/events
+# connection holds a Subscription with a small bounded buffer and sleeps on
+# a condition variable until something arrives, so idle clients cost one
+# parked thread/greenlet and no polling.
+#
+# The broker is per worker process: with several gunicorn workers a client
+# sees events ingested by its own worker live, and everything else through
+# the database replay when it reconnects. Replay (Last-Event-ID) therefore
+# always reads the database; nothing here could tell which ids another
+# worker stored.
+
+class TooManySubscribers(Exception):
+    pass
+
+class Subscription:
+    def __init__(self, broker, topic, max_pending):
+        self.broker = broker
+        self.topic = topic
+        self.lagged = False
+        self._pending = deque()
+        self._max_pending = max_pending
+        self._cond = threading.Condition()
+
+    def _offer(self, message):
+        with self._cond:
+            if len(self._pending) >= self._max_pending:
+                # slow consumer: stop buffering, the client reconnects and replays
+                self.lagged = True
+            else:
+                self._pending.append(message)
+            self._cond.notify()
+
+    def get(self, timeout):
+        # -> list of messages, [] after `timeout` seconds of silence
+        with self._cond:
+            if not self._pending and not self.lagged:
+                self._cond.wait(timeout)
+            messages = list(self._pending)
+            self._pending.clear()
+            return messages
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class Broker:
+    def __init__(self, max_subscribers=50, max_pending=256):
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, message, topic=None):
+        # message: {"id": event id or None, "event": name, "data": {...}}
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.topic is None or s.topic == topic]
+            self.published += 1
+        for s in subscribers:
+            s._offer(message)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, topic=None):
+        # subscribe before reading the replay from the database, so nothing
+        # stored in between is missed (the caller drops the overlap)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"{len(self._subscribers)} streams open")
+            sub = Subscription(self, topic, self.max_pending)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+        }
@@ -0,0 +1,189 @@
+# Re-score archived snapshots with a (new) model.
+#
+#   python rescore.py score --model model.h5                 # every event with a snapshot
+#   python rescore.py score --model exports/model_int8.tflite --workers 8 --batch-size 64
+#   python rescore.py score --model model.h5 --records-walk   # drive from files under records/
+#   python rescore.py relabel --model model.h5 --below 0.2 --to false_positive --dry-run
+#
+# Images are decoded and resized in a process pool while the parent runs
+# batched predictions. Scores land in event_scores(event_id, model) and are
+# committed every --chunk images, so an interrupted run resumes where it
+# stopped (already scored events are skipped). Events that share a snapshot
+# (blob store dedup) are decoded and predicted once.
+import os
+import time
+import sqlite3
+import argparse
+import multiprocessing as mp
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+import scores
+import analytics
+import blobstore
+import fingerprints
+
+DROWSY_EVENT_TYPES = ("drowsy", "drowsiness")
+
+# ---------------- SCHEMA ---------------- #
+
+def init_score_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS event_scores(
+            event_id INTEGER NOT NULL,
+            model TEXT NOT NULL,
+            score REAL NOT NULL,
+            scored_at INTEGER NOT NULL,
+            PRIMARY KEY (event_id, model)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_event_scores_model ON event_scores(model, score)")
+
+def model_id(path):
+    return f"{os.path.basename(path)}:{fingerprints.file_hash(path)[:12]}"
+
+# ---------------- WORK LIST ---------------- #
+
+def snapshot_file(records_dir, image_path):
+    rel = blobstore.normalize_image_path(image_path)
+    if rel.startswith("records/"):
+        rel = rel[len("records/"):]
+    return os.path.join(records_dir, *rel.split("/"))
+
+def pending_work(conn, records_dir, model, records_walk=False):
+    # -> {absolute file: [event ids]}, only events not yet scored by `model`
+    rows = conn.execute("""
+        SELECT e.id, e.image_path FROM events e
+        WHERE e.image_path IS NOT NULL AND e.image_path != ''
+          AND NOT EXISTS (SELECT 1 FROM event_scores s WHERE s.event_id = e.id AND s.model = ?)
+        ORDER BY e.id
+    """, (model,)).fetchall()
+    by_file = defaultdict(list)
+    for event_id, image_path in rows:
+        by_file[os.path.normpath(snapshot_file(records_dir, image_path))].append(event_id)
+
+    if not records_walk:
+        return dict(by_file), 0
+    # the tree is the source of truth: score what is on disk, in path order
+    work, orphans = {}, 0
+    for root, dirs, files in os.walk(records_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.normpath(os.path.join(root, name))
+            if path in by_file:
+                work[path] = by_file[path]
+            elif name.lower().endswith((".jpg", ".jpeg", ".png")):
+                orphans += 1
+    return work, orphans
+
+# ---------------- DECODE (worker processes) ---------------- #
+
+_size = None
+
+def init_worker(size):
+    global _size
+    _size = size
+
+def decode(path):
+    # uint8 keeps the pickled payload 4x smaller than float32
+    try:
+        with Image.open(path) as img:
+            return np.asarray(img.convert("RGB").resize(_size[::-1], Image.NEAREST))
+    except (OSError, ValueError):
+        return None
+
+# ---------------- SCORE ---------------- #
+
+def rescore(conn, classifier, model, work, workers=None, batch_size=32, chunk=512, log=print):
+    stats = {"images": 0, "events": 0, "failed": 0}
+    files = list(work)
+    started = time.perf_counter()
+    ctx = mp.get_context("spawn")  # never fork a process that holds a TF runtime
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=init_worker,
+                             initargs=(tuple(classifier.input_size),)) as pool:
+        for lo in range(0, len(files), chunk):
+            paths = files[lo:lo + chunk]
+            images = list(pool.map(decode, paths, chunksize=max(1, len(paths) // (4 * (workers or os.cpu_count())))))
+            ok = [(p, img) for p, img in zip(paths, images) if img is not None]
+            stats["failed"] += len(paths) - len(ok)
+
+            now = int(time.time())
+            rows = []
+            for b in range(0, len(ok), batch_size):
+                batch = ok[b:b + batch_size]
+                scores = classifier.drowsy_scores(np.stack([img for _, img in batch]).astype(np.float32) / 255.0)
+                for (path, _), score in zip(batch, scores):
+                    rows.extend((event_id, model, float(score), now) for event_id in work[path])
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO event_scores(event_id, model, score, scored_at) VALUES (?, ?, ?, ?)", rows
+            )
+            conn.commit()
+            stats["images"] += len(ok)
+            stats["events"] += len(rows)
+            elapsed = time.perf_counter() - started
+            log(f"  {lo + len(paths)}/{len(files)} files, {stats['images'] / elapsed:.1f} images/s")
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+# ---------------- RELABEL ---------------- #
+
+def relabel(conn, model, below, to, dry_run=False):
+    # drowsy events the model now scores below `below` -> event_type `to`;
+    # a false_positive no longer counts against the driver's safety score
+    where = f"""
+        FROM events e JOIN event_scores s ON s.event_id = e.id
+        WHERE s.model = ? AND s.score < ? AND e.event_type IN ({",".join("?" * len(DROWSY_EVENT_TYPES))})
+    """
+    params = [model, below] + list(DROWSY_EVENT_TYPES)
+    rows = conn.execute("SELECT e.id, e.driver_id, e.ts_epoch " + where, params).fetchall()
+    ids = [r[0] for r in rows]
+    if ids and not dry_run:
+        conn.executemany("UPDATE events SET event_type=? WHERE id=?", [(to, i) for i in ids])
+        # per-type rollups are keyed on event_type
+        analytics.rebuild_rollups(conn)
+        scores.refresh_buckets(conn, [(r[1], r[2]) for r in rows])
+        conn.commit()
+    return ids
+
+# ---------------- CLI ---------------- #
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score archived snapshots and relabel false positives.")
+    parser.add_argument("command", choices=["score", "relabel"])
+    parser.add_argument("--db", default="drivers.db")
+    parser.add_argument("--records", default="records")
+    parser.add_argument("--model", default="model.h5")
+    parser.add_argument("--workers", type=int, default=None, help="decode processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--chunk", type=int, default=512, help="images per committed transaction")
+    parser.add_argument("--records-walk", action="store_true", help="walk records/ instead of events.image_path")
+    parser.add_argument("--below", type=float, default=0.2, help="relabel: drowsy score threshold")
+    parser.add_argument("--to", default="false_positive", help="relabel: new event_type")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    init_score_table(conn)
+    conn.commit()
+    model = model_id(args.model)
+
+    if args.command == "relabel":
+        ids = relabel(conn, model, args.below, args.to, dry_run=args.dry_run)
+        print(f"{len(ids)} event(s) scored below {args.below} by {model}"
+              f"{' (dry run)' if args.dry_run else f' relabelled to {args.to!r}'}")
+    else:
+        work, orphans = pending_work(conn, args.records, model, records_walk=args.records_walk)
+        missing = [p for p in work if not os.path.isfile(p)]
+        for p in missing:
+            del work[p]
+        print(f"🔎 {len(work)} snapshot(s) / {sum(map(len, work.values()))} event(s) to score with {model}"
+              f" ({len(missing)} missing file(s){f', {orphans} unreferenced' if args.records_walk else ''})")
+        if work:
+            import inference
+            classifier = inference.load_classifier(args.model)
+            stats = rescore(conn, classifier, model, work, args.workers, args.batch_size, args.chunk)
+            print(f"✅ {stats['images']} images ({stats['events']} events, {stats['failed']} undecodable) "
+                  f"in {stats['seconds']:.1f}s - {stats['images'] / max(stats['seconds'], 1e-9):.1f} images/s")
+    conn.close()
@@ -0,0 +1,223 @@
+import sys
+import time
+import math
+import sqlite3
+import argparse
+from collections import Counter, defaultdict
+from ingest import parse_ts  # re-exported: scores.parse_ts
+
+# Safety score = 100 * (1 - score_raw / MAX_SCORE), where every event in the
+# last 30 days adds weight 1 - days_ago / 30. The weight is linear in the
+# event time, so a bucket of n events with timestamp sum S contributes
+#     n - (n * now - S) / WINDOW_SECONDS
+# and the score can be read from a handful of (n, S) rows per driver instead
+# of rescanning every event. Only the one bucket straddling the window edge
+# is summed from `events` (an idx_events_driver_epoch range scan).
+
+WINDOW_DAYS = 30
+WINDOW_SECONDS = WINDOW_DAYS * 24 * 60 * 60
+BUCKET_SECONDS = 60 * 60
+MAX_SCORE = 30.0
+# event types that do not count against the driver (rescore.py relabel)
+UNSCORED_EVENT_TYPES = ("false_positive",)
+SCORED_SQL = "(event_type IS NULL OR event_type NOT IN (%s))" % ",".join(
+    "'%s'" % t for t in UNSCORED_EVENT_TYPES)
+
+# ---------------- SCHEMA ---------------- #
+
+def init_score_tables(conn):
+    c = conn.cursor()
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='driver_scores'"
+    ).fetchone()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS driver_scores(
+            driver_id INTEGER PRIMARY KEY,
+            total_events INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS driver_score_buckets(
+            driver_id INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            n INTEGER NOT NULL,
+            ts_sum REAL NOT NULL,
+            PRIMARY KEY (driver_id, bucket)
+        ) WITHOUT ROWID;
+    """)
+    # first run against an existing database: build the aggregates once
+    if not exists:
+        rebuild_scores(conn)
+
+# ---------------- INCREMENTAL UPDATE ---------------- #
+
+def record_events(conn, rows, now=None):
+    # rows are (driver_id, event_type, ts, image_path, ts_epoch) tuples, as
+    # inserted into `events`. Must run in the same transaction as the insert.
+    now = time.time() if now is None else now
+    oldest_bucket = int((now - WINDOW_SECONDS) // BUCKET_SECONDS)
+
+    totals = Counter()
+    buckets = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        driver_id, epoch = row[0], row[4]
+        if row[1] in UNSCORED_EVENT_TYPES:
+            continue
+        totals[driver_id] += 1
+        if epoch is None:
+            continue
+        bucket = int(epoch // BUCKET_SECONDS)
+        # buckets that have already left the window are never read again
+        if bucket < oldest_bucket:
+            continue
+        agg = buckets[(driver_id, bucket)]
+        agg[0] += 1
+        agg[1] += epoch
+
+    c = conn.cursor()
+    c.executemany(
+        """INSERT INTO driver_scores(driver_id, total_events) VALUES (?, ?)
+           ON CONFLICT(driver_id) DO UPDATE
+           SET total_events = total_events + excluded.total_events""",
+        totals.items()
+    )
+    c.executemany(
+        """INSERT INTO driver_score_buckets(driver_id, bucket, n, ts_sum) VALUES (?, ?, ?, ?)
+           ON CONFLICT(driver_id, bucket) DO UPDATE
+           SET n = n + excluded.n, ts_sum = ts_sum + excluded.ts_sum""",
+        [(d, b, n, s) for (d, b), (n, s) in buckets.items()]
+    )
+    # drop the buckets that have left the window for the drivers touched here
+    c.executemany(
+        "DELETE FROM driver_score_buckets WHERE driver_id=? AND bucket < ?",
+        [(driver_id, oldest_bucket) for driver_id in totals]
+    )
+
+def refresh_buckets(conn, events, now=None):
+    # Recounts the buckets and totals behind `events`, (driver_id, ts_epoch)
+    # pairs of rows whose event_type was changed in place. Same transaction
+    # as the update.
+    now = time.time() if now is None else now
+    oldest_bucket = int((now - WINDOW_SECONDS) // BUCKET_SECONDS)
+    keys = {(driver_id, int(epoch // BUCKET_SECONDS)) for driver_id, epoch in events if epoch is not None}
+    c = conn.cursor()
+    for driver_id, bucket in keys:
+        if bucket < oldest_bucket:
+            continue
+        n, ts_sum = c.execute(
+            f"SELECT COUNT(*), TOTAL(ts_epoch) FROM events WHERE driver_id=? AND ts_epoch >= ? AND ts_epoch < ? "
+            f"AND {SCORED_SQL}",
+            (driver_id, bucket * BUCKET_SECONDS, (bucket + 1) * BUCKET_SECONDS)
+        ).fetchone()
+        if n:
+            c.execute("INSERT OR REPLACE INTO driver_score_buckets(driver_id, bucket, n, ts_sum) VALUES (?, ?, ?, ?)",
+                      (driver_id, bucket, n, ts_sum))
+        else:
+            c.execute("DELETE FROM driver_score_buckets WHERE driver_id=? AND bucket=?", (driver_id, bucket))
+    for driver_id in {driver_id for driver_id, _ in events}:
+        c.execute(
+            f"""INSERT OR REPLACE INTO driver_scores(driver_id, total_events)
+                SELECT ?, COUNT(*) FROM events WHERE driver_id=? AND {SCORED_SQL}""",
+            (driver_id, driver_id)
+        )
+
+# ---------------- READ ---------------- #
+
+def safety_score(conn, driver_id, now=None):
+    now = time.time() if now is None else now
+    cutoff = now - WINDOW_SECONDS
+
+    c = conn.cursor()
+    row = c.execute(
+        "SELECT total_events FROM driver_scores WHERE driver_id=?", (driver_id,)
+    ).fetchone()
+    total_events = row[0] if row else 0
+
+    score_raw = 0.0
+    c.execute(
+        "SELECT bucket, n, ts_sum FROM driver_score_buckets WHERE driver_id=? AND bucket >= ?",
+        (driver_id, int(cutoff // BUCKET_SECONDS))
+    )
+    for bucket, n, ts_sum in c.fetchall():
+        if bucket * BUCKET_SECONDS < cutoff:
+            # bucket straddles the window edge: only its events after the
+            # cutoff count, so sum those from the events table
+            n, ts_sum = c.execute(
+                f"SELECT COUNT(*), TOTAL(ts_epoch) FROM events WHERE driver_id=? AND ts_epoch > ? AND ts_epoch < ? "
+                f"AND {SCORED_SQL}",
+                (driver_id, cutoff, (bucket + 1) * BUCKET_SECONDS)
+            ).fetchone()
+        score_raw += n - (n * now - ts_sum) / WINDOW_SECONDS
+
+    score = max(0.0, 100.0 * (1.0 - score_raw / MAX_SCORE))
+    return round(score, 1), total_events, round(score_raw, 1)
+
+def recompute_score(conn, driver_id, now=None):
+    # reference implementation: full rescan of the driver's events
+    now = time.time() if now is None else now
+    c = conn.cursor()
+    c.execute(f"SELECT ts FROM events WHERE driver_id=? AND {SCORED_SQL}", (driver_id,))
+    timestamps = [row[0] for row in c.fetchall()]
+
+    score_raw = 0.0
+    for ts in timestamps:
+        event_time = parse_ts(ts)
+        if event_time is None:
+            continue
+        days_ago = (now - event_time) / (60 * 60 * 24)
+        score_raw += max(0.0, 1.0 - days_ago / WINDOW_DAYS)
+
+    score = max(0.0, 100.0 * (1.0 - score_raw / MAX_SCORE))
+    return round(score, 1), len(timestamps), round(score_raw, 1)
+
+# ---------------- BACKFILL ---------------- #
+
+def rebuild_scores(conn, chunk_size=5000):
+    now = time.time()
+    c = conn.cursor()
+    c.execute("DELETE FROM driver_scores")
+    c.execute("DELETE FROM driver_score_buckets")
+    src = conn.cursor()
+    src.execute("SELECT driver_id, event_type, ts, image_path, ts_epoch FROM events")
+    count = 0
+    while True:
+        rows = src.fetchmany(chunk_size)
+        if not rows:
+            break
+        record_events(conn, [tuple(r) for r in rows], now=now)
+        count += len(rows)
+    return count
+
+def verify_scores(conn, now=None):
+    now = time.time() if now is None else now
+    mismatches = []
+    for (driver_id,) in conn.execute("SELECT DISTINCT driver_id FROM events").fetchall():
+        fast = safety_score(conn, driver_id, now)
+        full = recompute_score(conn, driver_id, now)
+        if fast[1] != full[1] or not math.isclose(fast[2], full[2], abs_tol=0.1):
+            mismatches.append((driver_id, fast, full))
+    return mismatches
+
+# ---------------- CLI ---------------- #
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the per-driver safety score aggregates.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--db", default="drivers.db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.command == "rebuild":
+        init_score_tables(conn)
+        started = time.perf_counter()
+        count = rebuild_scores(conn)
+        conn.commit()
+        print(f"Rebuilt score aggregates from {count} events in {time.perf_counter() - started:.2f}s")
+    else:
+        mismatches = verify_scores(conn)
+        for driver_id, fast, full in mismatches:
+            print(f"driver {driver_id}: aggregate={fast} full={full}")
+        print("OK" if not mismatches else f"{len(mismatches)} driver(s) differ")
+        conn.close()
+        sys.exit(1 if mismatches else 0)
+    conn.close()
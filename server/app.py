@@ -1,6 +1,10 @@
 import time
-from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, has_app_context
 import sqlite3, os, json
+import db_pool
+import metrics
+import ingest
+import blobstore
 
 # ---------------- CONFIG ---------------- #
 
@@ -15,11 +19,24 @@ os.makedirs(RECORDS_DIR, exist_ok=True)
 
 # ---------------- DATABASE ---------------- #
 
+pool = db_pool.ConnectionPool(DB_PATH, size=int(os.environ.get("DB_POOL_SIZE", "8")))
+# per-route latency, SQLite time per request, /metrics (see metrics.py)
+metrics.instrument(app, pool)
+
 def db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
+    # pooled per gunicorn worker; conn.close() returns it to the pool
+    conn = pool.acquire()
+    if has_app_context():
+        g.setdefault("db_conns", []).append((conn, conn.lease))
     return conn
 
+@app.teardown_appcontext
+def release_db(exc):
+    # only checkouts this request still owns; a closed one may already be
+    # back in use by another request or the write-behind flusher
+    for conn, lease in g.pop("db_conns", []):
+        pool.release(conn, lease)
+
 def init_db():
     conn = db()
     c = conn.cursor()
@@ -31,15 +48,8 @@ def init_db():
             email TEXT
         );
     """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS events(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            driver_id INTEGER,
-            event_type TEXT,
-            ts TEXT,
-            image_path TEXT
-        );
-    """)
+    ingest.init_events(conn)
+    blobstore.init_blob_tables(conn)
     conn.commit()
     conn.close()
 
@@ -172,20 +182,122 @@ def passenger():
     )
 
 
+# ---------------- EVENT INGEST ---------------- #
+
+# validation, schema and the idempotent insert live in ingest.py (shared with
+# the full app in the repo root)
+
+MAX_SNAPSHOT_BYTES = 10 * 1024 * 1024
+# whole request body, multipart included; Werkzeug answers 413 beyond it
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_UPLOAD_MB", "64")) * 1024 * 1024
+blobs = blobstore.BlobStore(RECORDS_DIR)
+
+@app.errorhandler(413)
+def request_too_large(exc):
+    return jsonify({"status": "error", "error": f"request larger than {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+def link_blobs(conn, rows, ids):
+    blobstore.link_events(conn, list(zip(ids, (row[3] for row in rows))))
+
+def store_events(rows):
+    # -> (ids, duplicates), see ingest.insert_events
+    conn = db()
+    try:
+        stored = ingest.insert_events(conn, rows, on_insert=link_blobs)
+        conn.commit()
+    finally:
+        conn.close()
+    metrics.record_ingest(len(rows) - len(stored[1]))
+    return stored
+
+def save_snapshot(stream):
+    digest, size, _ = blobs.put_stream(stream, max_bytes=MAX_SNAPSHOT_BYTES, verify=True)
+    conn = db()
+    try:
+        blobs.record(conn, digest, size)
+        conn.commit()
+    finally:
+        conn.close()
+    return digest, size, blobs.image_path(digest)
+
+def replayed_keys(keys):
+    keys = {k for k in keys if k is not None}
+    if not keys:
+        return {}
+    conn = db()
+    try:
+        return ingest.replayed_events(conn, keys)
+    finally:
+        conn.close()
+
+def batch_response(results, rows, row_index, started):
+    ids, duplicates = store_events(rows)
+    elapsed = time.perf_counter() - started
+    for n, (i, event_id) in enumerate(zip(row_index, ids)):
+        results[i]["id"] = event_id
+        if n in duplicates:
+            results[i]["status"] = "duplicate"
+    rows_per_sec = round(len(rows) / elapsed, 1) if elapsed > 0 else None
+    app.logger.info("batch ingest: %d rows in %.1f ms (%s rows/s)", len(rows), elapsed * 1000, rows_per_sec)
+
+    return jsonify({
+        "status": "ok" if len(rows) == len(results) else "partial",
+        "accepted": len(rows),
+        "rejected": len(results) - len(rows),
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "rows_per_sec": rows_per_sec,
+        "results": results
+    })
+
 # ---------------- API ---------------- #
 
 @app.route("/api/event", methods=["POST"])
 def api_event():
-    data = request.json
-    conn = db()
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO events(driver_id, event_type, ts, image_path) VALUES (?,?,?,?)",
-        (data["driver_id"], data["event_type"], data["ts"], data.get("image_path"))
-    )
-    conn.commit()
-    conn.close()
-    return jsonify({"status": "ok"})
+    item = request.get_json(silent=True)
+    if isinstance(item, dict) and request.headers.get("Idempotency-Key"):
+        item.setdefault("idempotency_key", request.headers["Idempotency-Key"])
+    row, error = ingest.validate_event(item)
+    if error:
+        return jsonify({"status": "error", "error": error}), 400
+    ids, duplicates = store_events([row])
+    return jsonify({"status": "duplicate" if duplicates else "ok", "id": ids[0]})
+
+@app.route("/api/events/batch", methods=["POST"])
+def api_events_batch():
+    items = ingest.parse_batch_body(request)
+    if items is None:
+        return jsonify({"status": "error", "error": "expected a JSON array or NDJSON body"}), 400
+    if len(items) > ingest.MAX_BATCH_EVENTS:
+        return jsonify({"status": "error", "error": f"batch larger than {ingest.MAX_BATCH_EVENTS} events"}), 413
+
+    started = time.perf_counter()
+    results, rows, row_index = [], [], []
+    for i, item in enumerate(items):
+        row, error = ingest.validate_event(item)
+        if error:
+            results.append({"index": i, "status": "error", "error": error})
+        else:
+            results.append({"index": i, "status": "ok"})
+            rows.append(row)
+            row_index.append(i)
+    return batch_response(results, rows, row_index, started)
+
+@app.route("/api/events/upload", methods=["POST"])
+def api_events_upload():
+    # multipart: an `events` JSON array field plus one file part per
+    # snapshot, named by the event's "image" (what the detector spool sends)
+    try:
+        items = json.loads(request.form.get("events", ""))
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        return jsonify({"status": "error", "error": "expected an `events` JSON array field"}), 400
+    if len(items) > ingest.MAX_BATCH_EVENTS:
+        return jsonify({"status": "error", "error": f"batch larger than {ingest.MAX_BATCH_EVENTS} events"}), 413
+
+    started = time.perf_counter()
+    results, rows, row_index, _ = ingest.collect_uploads(items, request.files, save_snapshot, replayed_keys)
+    return batch_response(results, rows, row_index, started)
 
 # ---------------- LOCAL RUN ---------------- #
 
@@ -0,0 +1,264 @@
+import os
+import re
+import time
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+from collections import Counter
+
+# Content-addressed snapshot storage. A JPEG is stored once under
+#     records/blobs/<h[0:2]>/<sha256>.jpg
+# so exact duplicates (consecutive identical drowsy frames, client retries)
+# share one file, and files spread evenly over 256 shard directories.
+# events.image_path keeps pointing at a path under records/, so /records/ and
+# /thumbs/ serve blobs unchanged; event_blobs maps event id -> blob hash.
+
+BLOB_DIR = "blobs"
+CHUNK_SIZE = 64 * 1024
+BLOB_PATH_RE = re.compile(r"(?:^|/)blobs/[0-9a-f]{2}/([0-9a-f]{64})\.jpg$")
+
+class InvalidImage(ValueError):
+    pass
+
+def verify_image(path):
+    # rejects empty and undecodable uploads before they enter the store
+    if not os.path.getsize(path):
+        raise InvalidImage("snapshot is empty")
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            img.load()
+    except (OSError, SyntaxError, ValueError):
+        raise InvalidImage("snapshot is not a decodable image")
+
+def normalize_image_path(image_path):
+    # rows written by the Windows client look like records\1\drowsy_....jpg
+    return image_path.replace("\\", "/").lstrip("/") if image_path else image_path
+
+def blob_hash_from_path(image_path):
+    match = BLOB_PATH_RE.search(normalize_image_path(image_path or ""))
+    return match.group(1) if match else None
+
+# ---------------- SCHEMA ---------------- #
+
+def init_blob_tables(conn):
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_blobs(
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refs INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER
+        ) WITHOUT ROWID;
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS event_blobs(
+            event_id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL
+        );
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_event_blobs_hash ON event_blobs(hash)")
+
+def link_events(conn, pairs):
+    # pairs of (event_id, image_path); paths outside the blob store are skipped
+    links = [(event_id, h) for event_id, h in
+             ((event_id, blob_hash_from_path(p)) for event_id, p in pairs) if h]
+    if not links:
+        return
+    c = conn.cursor()
+    c.executemany("INSERT OR IGNORE INTO event_blobs(event_id, hash) VALUES (?, ?)", links)
+    c.executemany("UPDATE snapshot_blobs SET refs = refs + 1 WHERE hash=?", [(h,) for _, h in links])
+
+# ---------------- STORE ---------------- #
+
+class BlobStore:
+    def __init__(self, records_dir):
+        self.records_dir = records_dir
+        self.root = os.path.join(records_dir, BLOB_DIR)
+        os.makedirs(self.root, exist_ok=True)
+
+    def relpath(self, digest):
+        return f"{BLOB_DIR}/{digest[:2]}/{digest}.jpg"
+
+    def image_path(self, digest):
+        # value stored in events.image_path
+        return f"{os.path.basename(os.path.normpath(self.records_dir))}/{self.relpath(digest)}"
+
+    def abspath(self, digest):
+        return os.path.join(self.records_dir, *self.relpath(digest).split("/"))
+
+    def exists(self, digest):
+        return os.path.exists(self.abspath(digest))
+
+    def put_stream(self, stream, chunk_size=CHUNK_SIZE, max_bytes=None, verify=False):
+        # Streams `stream` to a temp file next to the store while hashing,
+        # then renames it into place atomically. Returns (digest, size, created).
+        # verify=True raises InvalidImage unless the file decodes as an image.
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        h = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError(f"snapshot larger than {max_bytes} bytes")
+                    h.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            if verify:
+                verify_image(tmp)
+            digest = h.hexdigest()
+            created = self._commit_file(tmp, digest)
+            return digest, size, created
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def put_file(self, src, move=False):
+        h = hashlib.sha256()
+        with open(src, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        if self.exists(digest):
+            return digest, os.path.getsize(src), False
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        os.close(fd)
+        try:
+            if move:
+                os.replace(src, tmp)
+            else:
+                shutil.copy2(src, tmp)
+            created = self._commit_file(tmp, digest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return digest, os.path.getsize(self.abspath(digest)), created
+
+    def _commit_file(self, tmp, digest):
+        dest = self.abspath(digest)
+        if os.path.exists(dest):
+            return False
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp, dest)
+        return True
+
+    def record(self, conn, digest, size):
+        conn.execute(
+            "INSERT OR IGNORE INTO snapshot_blobs(hash, size, refs, created_at) VALUES (?, ?, 0, ?)",
+            (digest, size, int(time.time()))
+        )
+
+# ---------------- MIGRATION ---------------- #
+
+def migrate(conn, records_dir, dry_run=False, chunk_size=500):
+    # Moves every snapshot referenced by events.image_path into the blob store
+    # and rewrites the path. An original is only deleted once every event
+    # that references it has been rewritten and committed (many events share
+    # a file), so an interrupted run can be restarted.
+    store = BlobStore(records_dir)
+    init_blob_tables(conn)
+    conn.commit()
+
+    stats = {"events": 0, "missing": 0, "outside": 0, "files": 0, "unique_blobs": 0,
+             "bytes_before": 0, "bytes_after": 0}
+    root = os.path.realpath(records_dir)
+    rows = conn.execute(
+        "SELECT id, image_path FROM events WHERE image_path IS NOT NULL AND image_path != ''"
+    ).fetchall()
+    work = []
+    refs = Counter()  # original file -> events still pointing at it
+    for event_id, image_path in rows:
+        if blob_hash_from_path(image_path):
+            continue
+        rel = normalize_image_path(image_path)
+        if rel.startswith("records/"):
+            rel = rel[len("records/"):]
+        # image_path comes from clients: never read or delete outside records/
+        src = os.path.realpath(os.path.join(records_dir, *rel.split("/")))
+        if os.path.commonpath([root, src]) != root:
+            stats["outside"] += 1
+            continue
+        work.append((event_id, src))
+        refs[src] += 1
+
+    seen_files = {}
+    seen_blobs = set()
+    pending = []
+
+    def flush():
+        if dry_run:
+            pending.clear()
+            return
+        conn.executemany("UPDATE events SET image_path=? WHERE id=?",
+                         [(store.image_path(d), event_id) for event_id, d, _ in pending])
+        link_events(conn, [(event_id, store.image_path(d)) for event_id, d, _ in pending])
+        conn.commit()
+        for _, _, src in pending:
+            refs[src] -= 1
+            if not refs[src] and os.path.exists(src):
+                os.remove(src)
+        pending.clear()
+
+    for event_id, src in work:
+        if not os.path.isfile(src):
+            stats["missing"] += 1
+            continue
+        stats["events"] += 1
+        if src not in seen_files:
+            size = os.path.getsize(src)
+            stats["files"] += 1
+            stats["bytes_before"] += size
+            if dry_run:
+                with open(src, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+            else:
+                digest, size, _ = store.put_file(src)
+                store.record(conn, digest, size)
+            if digest not in seen_blobs:
+                seen_blobs.add(digest)
+                stats["bytes_after"] += size
+            seen_files[src] = digest
+        pending.append((event_id, seen_files[src], src))
+        if len(pending) >= chunk_size:
+            flush()
+    flush()
+
+    if not dry_run:
+        # drop now-empty per-driver directories
+        for entry in os.scandir(records_dir):
+            if entry.is_dir() and entry.name != BLOB_DIR and not os.listdir(entry.path):
+                os.rmdir(entry.path)
+
+    stats["unique_blobs"] = len(seen_blobs)
+    stats["bytes_reclaimed"] = stats["bytes_before"] - stats["bytes_after"]
+    return stats
+
+# ---------------- CLI ---------------- #
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move records/ snapshots into content-addressed storage.")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--db", default="drivers.db")
+    parser.add_argument("--records", default="records")
+    parser.add_argument("--dry-run", action="store_true", help="hash and report only, change nothing")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    started = time.perf_counter()
+    stats = migrate(conn, args.records, dry_run=args.dry_run)
+    conn.close()
+
+    print(f"Events migrated:    {stats['events']} ({stats['missing']} with missing files, "
+          f"{stats['outside']} pointing outside {args.records})")
+    print(f"Snapshot files:     {stats['files']} -> {stats['unique_blobs']} unique blobs")
+    print(f"Bytes before/after: {stats['bytes_before']} / {stats['bytes_after']}")
+    print(f"Space reclaimed:    {stats['bytes_reclaimed'] / 1024:.1f} KiB"
+          f"{' (dry run)' if args.dry_run else ''} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,272 @@
+import json
+import time
+
+# Event ingest shared by main.py and the deployed server/app.py (server/
+# carries a copy, like db_pool.py and metrics.py): schema, validation and
+# the idempotent batch insert. Rows are tuples in EVENT_ROW order.
+
+EVENT_ROW = ("driver_id", "event_type", "ts", "image_path", "ts_epoch",
+             "episode_start", "episode_end", "peak_score", "idempotency_key")
+REQUIRED_EVENT_FIELDS = ("driver_id", "event_type", "ts")
+EPISODE_FIELDS = ("episode_start", "episode_end", "peak_score")
+MAX_BATCH_EVENTS = 5000
+MAX_IDEMPOTENCY_KEY = 128
+
+# canonical format first, then the legacy client formats found in drivers.db
+TS_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d_%H-%M-%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S.%f",
+)
+
+def parse_ts(ts):
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    if isinstance(ts, str) and ts.isdigit():
+        return float(ts)
+    for fmt in TS_FORMATS:
+        try:
+            return time.mktime(time.strptime(ts, fmt))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+# ---------------- SCHEMA ---------------- #
+
+def init_events(conn):
+    # -> True when legacy rows were migrated (derived tables need a rebuild)
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS events(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            driver_id INTEGER,
+            event_type TEXT,
+            ts TEXT,
+            image_path TEXT,
+            ts_epoch INTEGER,
+            episode_start INTEGER,
+            episode_end INTEGER,
+            peak_score REAL,
+            idempotency_key TEXT
+        );
+    """)
+    migrated = migrate_events(conn)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_driver_epoch ON events(driver_id, ts_epoch)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_driver_id ON events(driver_id, id)")
+    # NULL keys (legacy clients) never collide
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_events_idempotency ON events(idempotency_key)")
+    return migrated
+
+def migrate_events(conn, chunk_size=5000):
+    # Older databases have no ts_epoch column and store `ts` in several text
+    # formats (e.g. 2025-08-26_16-28-07). Add the column and normalise them.
+    c = conn.cursor()
+    columns = [row[1] for row in c.execute("PRAGMA table_info(events)")]
+    added = "ts_epoch" not in columns
+    if added:
+        c.execute("ALTER TABLE events ADD COLUMN ts_epoch INTEGER")
+    # episode fields sent by the detector's temporal layer (NULL for legacy rows)
+    # idempotency_key: client-generated, lets spooled clients replay safely
+    for column, kind in (("episode_start", "INTEGER"), ("episode_end", "INTEGER"), ("peak_score", "REAL"),
+                         ("idempotency_key", "TEXT")):
+        if column not in columns:
+            c.execute(f"ALTER TABLE events ADD COLUMN {column} {kind}")
+
+    c.execute("SELECT id, ts FROM events WHERE ts_epoch IS NULL")
+    updates = []
+    for event_id, ts in c.fetchall():
+        epoch = parse_ts(ts)
+        if epoch is not None:
+            updates.append((int(epoch), event_id))
+    for i in range(0, len(updates), chunk_size):
+        c.executemany("UPDATE events SET ts_epoch=? WHERE id=?", updates[i:i + chunk_size])
+    return added or bool(updates)
+
+# ---------------- VALIDATION ---------------- #
+
+def validate_event(item):
+    if not isinstance(item, dict):
+        return None, "event must be a JSON object"
+    missing = [k for k in REQUIRED_EVENT_FIELDS if item.get(k) in (None, "")]
+    if missing:
+        return None, "missing field(s): " + ", ".join(missing)
+    driver_id = item["driver_id"]
+    if isinstance(driver_id, bool) or (isinstance(driver_id, float) and not driver_id.is_integer()):
+        return None, "driver_id must be an integer"
+    try:
+        driver_id = int(driver_id)
+    except (TypeError, ValueError):
+        return None, "driver_id must be an integer"
+    image_path = item.get("image_path")
+    if image_path is not None and not isinstance(image_path, str):
+        return None, "image_path must be a string"
+    if image_path:
+        parts = image_path.replace("\\", "/").split("/")
+        if not parts[0] or ":" in parts[0] or ".." in parts:
+            return None, "image_path must be a relative path inside records/"
+    ts = str(item["ts"])
+    epoch = parse_ts(ts)
+    if epoch is None:
+        return None, "ts: unrecognised timestamp"
+    episode = []
+    for key in ("episode_start", "episode_end"):
+        value = item.get(key)
+        if value in (None, ""):
+            episode.append(None)
+            continue
+        parsed = parse_ts(value)
+        if parsed is None:
+            return None, f"{key}: unrecognised timestamp"
+        episode.append(int(parsed))
+    if None not in episode and episode[1] < episode[0]:
+        return None, "episode_end is before episode_start"
+    peak_score = item.get("peak_score")
+    if peak_score not in (None, ""):
+        try:
+            peak_score = float(peak_score)
+        except (TypeError, ValueError):
+            return None, "peak_score must be a number"
+        if not 0.0 <= peak_score <= 1.0:
+            return None, "peak_score must be between 0 and 1"
+    else:
+        peak_score = None
+    key = item.get("idempotency_key")
+    if key in (None, ""):
+        key = None
+    elif not isinstance(key, str) or len(key) > MAX_IDEMPOTENCY_KEY:
+        return None, f"idempotency_key must be a string of at most {MAX_IDEMPOTENCY_KEY} characters"
+    return (
+        driver_id, str(item["event_type"]), ts, image_path, int(epoch),
+        episode[0], episode[1], peak_score, key
+    ), None
+
+def parse_batch_body(request):
+    # Accepts a JSON array, {"events": [...]}, or NDJSON (one event per line).
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+        return items
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get("events")
+    return payload if isinstance(payload, list) else None
+
+# ---------------- INSERT ---------------- #
+
+def existing_keys(conn, keys, chunk_size=500):
+    found = {}
+    keys = list(keys)
+    for i in range(0, len(keys), chunk_size):
+        chunk = keys[i:i + chunk_size]
+        found.update(conn.execute(
+            "SELECT idempotency_key, id FROM events WHERE idempotency_key IN (%s)" % ",".join("?" * len(chunk)),
+            chunk
+        ).fetchall())
+    return found
+
+def replayed_events(conn, keys, chunk_size=500):
+    # idempotency key -> (id, image_path) of the event stored the first time
+    found = {}
+    keys = list(keys)
+    for i in range(0, len(keys), chunk_size):
+        chunk = keys[i:i + chunk_size]
+        found.update((key, (event_id, image_path)) for key, event_id, image_path in conn.execute(
+            "SELECT idempotency_key, id, image_path FROM events WHERE idempotency_key IN (%s)"
+            % ",".join("?" * len(chunk)),
+            chunk
+        ))
+    return found
+
+def insert_events(conn, rows, on_insert=None):
+    # One executemany inside one transaction; AUTOINCREMENT ids are
+    # contiguous while we hold the write lock, so the new ids can be
+    # derived from last_insert_rowid().
+    # Returns (ids, duplicates): ids line up with rows; a replayed
+    # idempotency key maps to the id stored the first time and its index
+    # is in `duplicates`. on_insert(conn, new_rows, new_ids) runs in the
+    # same transaction, for tables derived from events.
+    if not rows:
+        return [], set()
+    if not conn.in_transaction:
+        # take the write lock before looking keys up, so two workers
+        # replaying the same batch cannot both miss
+        conn.execute("BEGIN IMMEDIATE")
+    known = existing_keys(conn, {row[8] for row in rows if row[8] is not None})
+    new_rows, new_index, duplicates, first = [], [], set(), {}
+    for i, row in enumerate(rows):
+        key = row[8]
+        if key is not None and (key in known or key in first):
+            duplicates.add(i)
+            continue
+        if key is not None:
+            first[key] = i
+        new_rows.append(row)
+        new_index.append(i)
+
+    ids = [None] * len(rows)
+    if new_rows:
+        c = conn.cursor()
+        c.executemany(
+            "INSERT INTO events(%s) VALUES (%s)" % (", ".join(EVENT_ROW), ",".join("?" * len(EVENT_ROW))),
+            new_rows
+        )
+        last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+        for i, event_id in zip(new_index, range(last_id - len(new_rows) + 1, last_id + 1)):
+            ids[i] = event_id
+        if on_insert is not None:
+            on_insert(conn, new_rows, [ids[i] for i in new_index])
+    for i in duplicates:
+        key = rows[i][8]
+        ids[i] = known[key] if key in known else ids[first[key]]
+    return ids, duplicates
+
+# ---------------- SNAPSHOT UPLOAD ---------------- #
+
+def collect_uploads(items, files, save_snapshot, find_replayed):
+    # Multipart /api/events/upload: validates each item and stores the file
+    # part it names (`"image": "<field>"`) via save_snapshot(stream) ->
+    # (digest, size, image_path), which raises ValueError for a bad file.
+    # find_replayed(keys) maps keys that are already stored to (id,
+    # image_path); their files are not written again and they report the
+    # stored image_path (the insert answers them as duplicates).
+    # -> (results, rows, row_index, saved)
+    results, rows, row_index, saved = [], [], [], []
+    checked = [validate_event(item) for item in items]
+    stored_paths = {key: image_path for key, (_, image_path) in
+                    find_replayed(row[8] for row, error in checked if not error).items()}
+    for i, (item, (row, error)) in enumerate(zip(items, checked)):
+        key = row[8] if not error else None
+        image = item.get("image") if not error else None
+        if key in stored_paths:
+            row = row[:3] + (stored_paths[key],) + row[4:]
+        elif image not in (None, ""):
+            if not isinstance(image, str):
+                error = "image must be the name of a file part"
+            elif files.get(image) is None:
+                error = f"no file part named {image!r}"
+            else:
+                try:
+                    digest, size, image_path = save_snapshot(files[image].stream)
+                except ValueError as e:
+                    error = str(e)
+                else:
+                    saved.append((digest, size))
+                    row = row[:3] + (image_path,) + row[4:]
+        if key is not None and not error:
+            stored_paths.setdefault(key, row[3])
+        if error:
+            results.append({"index": i, "status": "error", "error": error})
+        else:
+            results.append({"index": i, "status": "ok", "image_path": row[3]})
+            rows.append(row)
+            row_index.append(i)
+    return results, rows, row_index, saved
@@ -0,0 +1,212 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter, deque
+from flask import g, request, has_app_context, Response
+
+# Prometheus text-format metrics, no client library needed.
+#   - http_request_duration_seconds{route,method,status}  histogram
+#   - sqlite_queries_per_request / sqlite_seconds_per_request{route}  histograms
+#   - sqlite_queries_total, sqlite_query_seconds_total
+#   - snapshot_bytes_served_total{endpoint}
+#   - events_ingested_total, events_ingest_rows_per_second (last minute)
+# Values are per worker process; with several gunicorn workers each scrape
+# sees the worker that answered it (the `pid` label tells them apart).
+#
+# Opt-in profiling: with PROFILE_REQUESTS=1, a request sent with
+# `X-Profile: 1` is sampled every PROFILE_INTERVAL_MS by a background thread;
+# if it takes at least PROFILE_SLOW_MS, its stacks are written in collapsed
+# ("folded") format to PROFILE_DIR, ready for flamegraph.pl / speedscope.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+BYTES_ENDPOINTS = ("records_static", "records_thumb")
+
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = int(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000.0
+PROFILE_SLOW = int(os.environ.get("PROFILE_SLOW_MS", "200")) / 1000.0
+
+def _labels(names, values):
+    return ",".join(f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                    for n, v in zip(names, values))
+
+class CounterMetric:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self.values[labels] += amount
+
+    def render(self, pid):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        # snapshot under the lock: request threads add label sets mid-scrape
+        with self._lock:
+            items = list(self.values.items())
+        for key, value in sorted(items):
+            lines.append(f"{self.name}{{{_labels(('pid',) + self.labels, (pid,) + key)}}} {value}")
+        return lines
+
+class HistogramMetric:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = buckets
+        self.series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            s = self.series.get(labels)
+            if s is None:
+                s = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[i] += 1
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self, pid):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = ("pid",) + self.labels
+        with self._lock:
+            items = [(key, list(s)) for key, s in self.series.items()]
+        for key, s in sorted(items):
+            base = _labels(names, (pid,) + key)
+            for bound, n in zip(self.buckets, s):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {s[-2]}')
+            lines.append(f"{self.name}_count{{{base}}} {s[-2]}")
+            lines.append(f"{self.name}_sum{{{base}}} {s[-1]:.6f}")
+        return lines
+
+REQUEST_SECONDS = HistogramMetric("http_request_duration_seconds", "Request latency by route.",
+                                  LATENCY_BUCKETS, ("route", "method", "status"))
+REQUEST_QUERIES = HistogramMetric("sqlite_queries_per_request", "SQLite statements per request.",
+                                  QUERY_BUCKETS, ("route",))
+REQUEST_SQL_SECONDS = HistogramMetric("sqlite_seconds_per_request", "Time in SQLite per request.",
+                                      LATENCY_BUCKETS, ("route",))
+QUERIES = CounterMetric("sqlite_queries_total", "SQLite statements executed.")
+QUERY_SECONDS = CounterMetric("sqlite_query_seconds_total", "Time spent in SQLite statements and fetches.")
+BYTES_SERVED = CounterMetric("snapshot_bytes_served_total", "Snapshot/thumbnail bytes sent.", ("endpoint",))
+INGESTED = CounterMetric("events_ingested_total", "Events accepted for storage.")
+ALL = (REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_SQL_SECONDS, QUERIES, QUERY_SECONDS, BYTES_SERVED, INGESTED)
+
+_ingest_window = deque()  # (time, rows) over the last minute
+_ingest_lock = threading.Lock()
+
+def record_ingest(rows):
+    if not rows:
+        return
+    INGESTED.inc(rows)
+    now = time.time()
+    with _ingest_lock:
+        _ingest_window.append((now, rows))
+        while _ingest_window and _ingest_window[0][0] < now - 60:
+            _ingest_window.popleft()
+
+def ingest_rate():
+    now = time.time()
+    with _ingest_lock:
+        while _ingest_window and _ingest_window[0][0] < now - 60:
+            _ingest_window.popleft()
+        return sum(n for _, n in _ingest_window) / 60.0
+
+def observe_sql(seconds, queries):
+    # db_pool observer: global totals plus the current request's share
+    if queries:
+        QUERIES.inc(queries)
+    QUERY_SECONDS.inc(seconds)
+    if has_app_context() and "metrics_started" in g:
+        g.sql_queries += queries
+        g.sql_seconds += seconds
+
+def render():
+    pid = os.getpid()
+    lines = []
+    for metric in ALL:
+        lines.extend(metric.render(pid))
+    lines += ["# HELP events_ingest_rows_per_second Events ingested per second over the last minute.",
+              "# TYPE events_ingest_rows_per_second gauge",
+              f'events_ingest_rows_per_second{{pid="{pid}"}} {ingest_rate():.3f}']
+    return "\n".join(lines) + "\n"
+
+# ---------------- PROFILER ---------------- #
+
+class StackSampler:
+    # Samples one thread's Python stack via sys._current_frames(); cheap
+    # enough for an opt-in request, and sees whatever code it is running.
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+def write_profile(stacks, endpoint, seconds):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{int(time.time() * 1000)}_{endpoint or 'unmatched'}_{int(seconds * 1000)}ms.folded"
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in stacks.most_common():
+            f.write(f"{stack} {n}\n")
+    return path
+
+# ---------------- FLASK WIRING ---------------- #
+
+def instrument(app, pool):
+    pool.observer = observe_sql
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+        if PROFILE_REQUESTS and request.headers.get("X-Profile") == "1":
+            g.profiler = StackSampler(threading.get_ident()).start()
+
+    @app.after_request
+    def _metrics_finish(response):
+        if "metrics_started" not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, route, request.method, response.status_code)
+        REQUEST_QUERIES.observe(g.sql_queries, route)
+        REQUEST_SQL_SECONDS.observe(g.sql_seconds, route)
+        if request.endpoint in BYTES_ENDPOINTS and response.status_code == 200:
+            BYTES_SERVED.inc(response.content_length or 0, request.endpoint)
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            stacks = profiler.stop()
+            response.headers["X-Profile-Samples"] = str(sum(stacks.values()))
+            if elapsed >= PROFILE_SLOW:
+                response.headers["X-Profile-File"] = write_profile(stacks, request.endpoint, elapsed)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
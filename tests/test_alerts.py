@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")  # detector.sources
+pytest.importorskip("requests")  # detector.sinks
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+pytest.importorskip("pygame")
+
+import alerts
+from detector import DetectionEngine, EpisodePolicy, MemorySink, ThresholdPolicy
+
+ALERT_WAV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alert.wav")
+FPS = 10
+
+class ScoreSource:
+    # the "image" of each frame is its drowsy score
+    live = False
+
+    def __init__(self, scores, start=1_700_000_000.0):
+        self.scores = scores
+        self.start = start
+
+    def frames(self):
+        for i, score in enumerate(self.scores):
+            yield self.start + i / FPS, score
+
+    def close(self):
+        pass
+
+class ScoreClassifier:
+    def preprocess(self, image):
+        return np.float32(image)
+
+    def drowsy_scores(self, batch):
+        return batch
+
+class RecordingPlayer(alerts.AlertPlayer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def trigger(self, level=None):
+        self.calls.append("trigger")
+        super().trigger(level)
+
+    def silence(self):
+        self.calls.append("silence")
+        super().silence()
+
+@pytest.fixture
+def player():
+    player = RecordingPlayer(ALERT_WAV)
+    yield player
+    player.stop()
+
+def run(policy, player, scores):
+    engine = DetectionEngine(ScoreSource(scores), ScoreClassifier(), MemorySink(), driver_id=1,
+                             policy=policy, alerts=player, alert_interval=1.0)
+    engine.run()
+    player.stop()  # drains the player's queue
+    return player.calls
+
+def test_threshold_policy_alerts_while_over_threshold(player):
+    scores = [0.9] * 25 + [0.1] * 10 + [0.9] * 5 + [0.1] * 5
+    calls = run(ThresholdPolicy(threshold=0.5), player, scores)
+    # every alert_interval s while over the threshold, cut when it drops
+    assert calls == ["trigger"] * 3 + ["silence"] + ["trigger"] + ["silence"]
+    assert player.played == 4
+    assert player.silenced == 2
+    assert player.level == 2  # the second stretch escalated
+
+def test_episode_policy_alerts_for_the_episode(player):
+    scores = [0.1] * 10 + [0.9] * 40 + [0.1] * 60
+    calls = run(EpisodePolicy(), player, scores)
+    assert calls[0] == "trigger"
+    assert calls[-1] == "silence"
+    assert calls.count("silence") == 1
+    assert player.played == calls.count("trigger") >= 3
+    assert player.silenced == 1
+
+def test_alarm_cut_when_stream_ends_mid_episode(player):
+    calls = run(ThresholdPolicy(threshold=0.5), player, [0.9] * 5)
+    assert calls == ["trigger", "silence"]
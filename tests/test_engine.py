@@ -0,0 +1,96 @@
+import time
+import itertools
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")  # detector.sources
+pytest.importorskip("requests")  # detector.sinks
+
+from detector import DetectionEngine, EpisodePolicy, MemorySink, ThresholdPolicy
+
+FPS = 10
+START = 1_700_000_000.0
+
+class ScoreSource:
+    # the "image" of each frame is its drowsy score
+    live = False
+
+    def __init__(self, scores):
+        self.scores = scores
+
+    def frames(self):
+        for i, score in enumerate(self.scores):
+            yield START + i / FPS, score
+
+    def close(self):
+        pass
+
+class ScoreClassifier:
+    def preprocess(self, image):
+        return np.float32(image)
+
+    def drowsy_scores(self, batch):
+        return batch
+
+class FailingClassifier(ScoreClassifier):
+    def __init__(self):
+        self.failed_at = None
+
+    def drowsy_scores(self, batch):
+        self.failed_at = time.perf_counter()
+        raise RuntimeError("model crashed")
+
+class FailingSink(MemorySink):
+    def send(self, events):
+        raise ConnectionError("server unreachable")
+
+def seconds(score, n):
+    return [score] * int(n * FPS)
+
+def run(policy, scores, sink=None, **kwargs):
+    sink = sink or MemorySink()
+    engine = DetectionEngine(ScoreSource(scores), ScoreClassifier(), sink, driver_id=7, policy=policy, **kwargs)
+    report = engine.run()
+    return sink.events, report
+
+def test_episode_policy_one_event_per_episode():
+    # the gap between the episodes is longer than the 10 s cooldown
+    scores = seconds(0.1, 1) + seconds(0.9, 3) + seconds(0.1, 15) + seconds(0.9, 3) + seconds(0.1, 2)
+    events, report = run(EpisodePolicy(), scores)
+    assert len(events) == 2
+    assert report["events"] == 2
+    for e in events:
+        assert e["driver_id"] == 7
+        assert e["episode_start"] <= e["episode_end"]
+        assert e["peak_score"] == pytest.approx(0.9)
+
+def test_threshold_policy_one_event_per_crossing():
+    # three drowsy spells, further apart than the 5 s cooldown
+    scores = (seconds(0.9, 1) + seconds(0.1, 6)) * 3
+    events, _ = run(ThresholdPolicy(threshold=0.5, cooldown=5.0), scores)
+    assert len(events) == 3
+    assert len({e["idempotency_key"] for e in events}) == 3
+
+def test_stage_error_is_reraised_promptly():
+    classifier = FailingClassifier()
+    source = ScoreSource(itertools.repeat(0.5))  # never ends on its own
+    engine = DetectionEngine(source, classifier, MemorySink(), driver_id=7)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        engine.run()
+    assert time.perf_counter() - classifier.failed_at < 0.1
+
+def test_failed_upload_goes_to_outbox():
+    scores = (seconds(0.9, 1) + seconds(0.1, 6)) * 3
+    outbox = MemorySink()
+    events, report = run(ThresholdPolicy(threshold=0.5, cooldown=5.0), scores,
+                         sink=FailingSink(), outbox=outbox)
+    assert events == []
+    assert len(outbox.events) == 3
+    assert report["events_outboxed"] == 3
+    assert report["events_lost"] == 0
+
+def test_failed_upload_without_outbox_is_counted_lost():
+    scores = seconds(0.9, 1)
+    _, report = run(ThresholdPolicy(threshold=0.5), scores, sink=FailingSink())
+    assert report["events_lost"] == 1
@@ -0,0 +1,85 @@
+import time
+import sqlite3
+
+import pytest
+
+import scores
+
+# not aligned to an hour, so one bucket straddles the window edge
+NOW = 1_700_000_000 + 1234
+CUTOFF = NOW - scores.WINDOW_SECONDS
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE events(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            driver_id INTEGER,
+            event_type TEXT,
+            ts TEXT,
+            image_path TEXT,
+            ts_epoch INTEGER
+        )
+    """)
+    scores.init_score_tables(conn)
+    yield conn
+    conn.close()
+
+def add_events(conn, driver_id, epochs, now=NOW):
+    # what insert_events() does: the row and the aggregates in one transaction
+    rows = [
+        (driver_id, "drowsiness", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(e)), None, e)
+        for e in epochs
+    ]
+    conn.executemany(
+        "INSERT INTO events(driver_id, event_type, ts, image_path, ts_epoch) VALUES (?, ?, ?, ?, ?)", rows
+    )
+    scores.record_events(conn, rows, now=now)
+    conn.commit()
+
+def test_score_matches_full_recompute(conn):
+    edge = CUTOFF - CUTOFF % scores.BUCKET_SECONDS
+    epochs = (
+        [NOW - i * 7919 for i in range(200)]                   # spread over the window
+        + [CUTOFF + 1, CUTOFF + 60] + [CUTOFF + 1500] * 300   # straddling bucket, inside
+        + [CUTOFF - 1] + [edge] * 300                          # straddling bucket, outside
+        + [CUTOFF - 3600, CUTOFF - 86400 * 10]                 # older than the window
+    )
+    add_events(conn, 1, epochs[:100])
+    add_events(conn, 1, epochs[100:])
+    add_events(conn, 2, [CUTOFF + 30, CUTOFF - 30])
+
+    for driver_id in (1, 2, 3):
+        assert scores.safety_score(conn, driver_id, NOW) == scores.recompute_score(conn, driver_id, NOW)
+    assert scores.verify_scores(conn, NOW) == []
+
+def test_score_counts_events_without_timestamp(conn):
+    conn.execute("INSERT INTO events(driver_id, event_type, ts) VALUES (1, 'drowsiness', 'garbage')")
+    scores.record_events(conn, [(1, "drowsiness", "garbage", None, None)], now=NOW)
+    add_events(conn, 1, [NOW - 3600])
+    assert scores.safety_score(conn, 1, NOW) == scores.recompute_score(conn, 1, NOW)
+    assert scores.safety_score(conn, 1, NOW)[1] == 2
+
+def test_expired_buckets_are_pruned_on_write(conn):
+    earlier = NOW - scores.WINDOW_SECONDS
+    add_events(conn, 1, [earlier - 3600 * h for h in range(48)], now=earlier)
+    add_events(conn, 1, [NOW - 60], now=NOW)
+    oldest = int(CUTOFF // scores.BUCKET_SECONDS)
+    stale = conn.execute(
+        "SELECT COUNT(*) FROM driver_score_buckets WHERE driver_id=1 AND bucket < ?", (oldest,)
+    ).fetchone()[0]
+    assert stale == 0
+    assert scores.safety_score(conn, 1, NOW) == scores.recompute_score(conn, 1, NOW)
+
+def test_relabelled_false_positives_leave_the_score(conn):
+    epochs = [NOW - 3600 * h for h in range(10)] + [CUTOFF + 60]
+    add_events(conn, 1, epochs)
+    relabelled = conn.execute(
+        "SELECT id, driver_id, ts_epoch FROM events WHERE driver_id=1 ORDER BY id LIMIT 4"
+    ).fetchall() + conn.execute("SELECT id, driver_id, ts_epoch FROM events ORDER BY id DESC LIMIT 1").fetchall()
+    conn.executemany("UPDATE events SET event_type='false_positive' WHERE id=?", [(r[0],) for r in relabelled])
+    scores.refresh_buckets(conn, [(r[1], r[2]) for r in relabelled], now=NOW)
+
+    assert scores.safety_score(conn, 1, NOW) == scores.recompute_score(conn, 1, NOW)
+    assert scores.safety_score(conn, 1, NOW)[1] == len(epochs) - 5
@@ -0,0 +1,134 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+from werkzeug.security import safe_join
+
+class UnrenderableImage(Exception):
+    pass
+
+class ThumbnailCache:
+    # Downsized JPEGs of records/ snapshots, generated on first request and
+    # kept in a size-bounded on-disk cache with LRU eviction. The cache key
+    # covers the source file's identity (path, size, mtime) and the width, so
+    # a replaced snapshot never serves a stale thumbnail and the key doubles
+    # as a strong ETag.
+    # Every gunicorn worker shares cache_dir, so usage is re-read from disk
+    # before evicting and at least every rescan_interval seconds; max_bytes
+    # bounds the whole directory, overshooting only by what other workers
+    # render in between.
+
+    def __init__(self, source_dir, cache_dir, max_bytes=256 * 1024 * 1024, widths=(160, 320), quality=80,
+                 rescan_interval=60.0):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._total = 0
+        self._scanned = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        # rebuild LRU order from access times on disk (left by a previous
+        # process or by the other workers)
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".jpg"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue  # evicted by another worker meanwhile
+                found.append((st.st_atime, name[:-4], st.st_size))
+        self._entries.clear()
+        self._total = 0
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+        self._scanned = time.monotonic()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".jpg")
+
+    def pick_width(self, requested):
+        for w in self.widths:
+            if requested is None or requested <= w:
+                return w
+        return self.widths[-1]
+
+    def get(self, filename, width=None):
+        # returns (thumbnail path, etag) or None if the source does not exist;
+        # raises UnrenderableImage when the source is not a readable image
+        source = safe_join(self.source_dir, filename.replace("\\", "/"))
+        if source is None or not os.path.isfile(source):
+            return None
+        width = self.pick_width(width)
+        st = os.stat(source)
+        key = hashlib.sha1(
+            f"{os.path.relpath(source, self.source_dir)}|{st.st_size}|{st.st_mtime_ns}|{width}".encode()
+        ).hexdigest()
+        path = self._path(key)
+
+        try:
+            # hit (possibly rendered by another worker): bump atime only,
+            # mtime drives Last-Modified and must stay put
+            cached = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), cached.st_mtime_ns))
+            size = cached.st_size
+        except FileNotFoundError:
+            size = self._render(source, path, width)
+
+        with self._lock:
+            if time.monotonic() - self._scanned > self.rescan_interval:
+                self._load_index()
+            self._total += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+        return path, key
+
+    def _render(self, source, path, width):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with Image.open(source) as img:
+                # let the JPEG decoder downscale while decoding
+                img.draft("RGB", (width, width))
+                img = img.convert("RGB")
+                img.thumbnail((width, width))
+        except (OSError, SyntaxError, ValueError) as e:
+            # UnidentifiedImageError is an OSError; so are truncated files
+            raise UnrenderableImage(str(e)) from e
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, "JPEG", quality=self.quality, optimize=True)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return os.path.getsize(path)
+
+    def _evict(self):
+        if self._total > self.max_bytes:
+            # count what the other workers rendered before deleting anything
+            self._load_index()
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total, "max_bytes": self.max_bytes}
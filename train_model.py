@@ -1,63 +1,88 @@
 import os
+import argparse
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout, Input
 from tensorflow.keras.optimizers import Adam
 import pickle  # ✅ NEW: for saving training history
+import feature_cache
+import data_pipeline
+import inference
+from data_pipeline import AUGMENTATION
 
-TRAIN_DIR = "dataset/Drowsy_datset/train"
-VAL_DIR = "dataset/Drowsy_datset/test"
-IMG_SIZE = (224, 224)
+TRAIN_DIR = data_pipeline.TRAIN_DIR
+VAL_DIR = data_pipeline.TEST_DIR
+IMG_SIZE = data_pipeline.IMG_SIZE
 BATCH_SIZE = 16
 EPOCHS = 10
 
-# Data Augmentation
-datagen = ImageDataGenerator(
-    rescale=1.0/255,
-    rotation_range=15,
-    zoom_range=0.2,
-    horizontal_flip=True,
-)
-
-train_gen = datagen.flow_from_directory(
-    TRAIN_DIR,
-    target_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    class_mode="binary"
-)
-
-val_gen = datagen.flow_from_directory(
-    VAL_DIR,
-    target_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    class_mode="binary"
-)
+parser = argparse.ArgumentParser()
+parser.add_argument("--cached-features", action="store_true",
+                    help="run the frozen backbone once, cache embeddings and train only the head")
+parser.add_argument("--views", type=int, default=1,
+                    help="with --cached-features: embeddings per training image (1 plain + K-1 augmented)")
+args = parser.parse_args()
 
 # Load Pretrained MobileNetV2
 base_model = MobileNetV2(weights="imagenet", include_top=False, input_shape=(224, 224, 3))
 for layer in base_model.layers:
     layer.trainable = False
 
-x = GlobalAveragePooling2D()(base_model.output)
-x = Dropout(0.3)(x)
-x = Dense(128, activation="relu")(x)
-x = Dropout(0.3)(x)
-output = Dense(1, activation="sigmoid")(x)
+# Head layers are shared between the full model and the cached-feature head
+pool = GlobalAveragePooling2D()
+head_layers = [
+    Dropout(0.3),
+    Dense(128, activation="relu"),
+    Dropout(0.3),
+    Dense(1, activation="sigmoid"),
+]
 
+def apply_head(x):
+    for layer in head_layers:
+        x = layer(x)
+    return x
+
+output = apply_head(pool(base_model.output))
 model = Model(inputs=base_model.input, outputs=output)
 model.compile(optimizer=Adam(1e-4), loss="binary_crossentropy", metrics=["accuracy"])
 
-# Train
-history = model.fit(train_gen, validation_data=val_gen, epochs=EPOCHS)
+if args.cached_features:
+    backbone = Model(inputs=base_model.input, outputs=pool(base_model.output))
+    train_x, train_y, class_indices = feature_cache.extract_features(
+        backbone, TRAIN_DIR, IMG_SIZE, views=args.views, augmentation=AUGMENTATION
+    )
+    val_x, val_y, _ = feature_cache.extract_features(backbone, VAL_DIR, IMG_SIZE)
+
+    head_input = Input(shape=(backbone.output_shape[-1],))
+    head = Model(inputs=head_input, outputs=apply_head(head_input))
+    head.compile(optimizer=Adam(1e-4), loss="binary_crossentropy", metrics=["accuracy"])
+
+    # Train
+    history = head.fit(
+        train_x, train_y,
+        validation_data=(val_x, val_y),
+        batch_size=BATCH_SIZE,
+        epochs=EPOCHS,
+        shuffle=True
+    )
+else:
+    # tf.data input: parallel decode, cached decoded images, batched augmentation
+    train_data = data_pipeline.make_dataset(TRAIN_DIR, IMG_SIZE, BATCH_SIZE, shuffle=True, augment=True)
+    val_data = data_pipeline.make_dataset(VAL_DIR, IMG_SIZE, BATCH_SIZE)
+    class_indices = train_data.class_indices
+
+    # Train
+    history = model.fit(train_data.dataset, validation_data=val_data.dataset, epochs=EPOCHS)
 
-# Save model
+# Save model (the head layers are shared, so this includes the cached-mode weights)
 model.save("model.h5")
-print("✅ Model trained and saved as model.h5")
+# the class order decides which way the sigmoid output points (see inference.py)
+inference.save_label_map("model.h5", class_indices)
+print("✅ Model trained and saved as model.h5 (class order in model.labels.json)")
 
 # ✅ Save training history
 with open("history.pkl", "wb") as f:
     pickle.dump(history.history, f)
-print("📈 Training history saved as history.pkl")
\ No newline at end of file
+print("📈 Training history saved as history.pkl")
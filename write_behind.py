@@ -0,0 +1,152 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# failures that retrying the same rows cannot fix
+BAD_ROWS = (sqlite3.IntegrityError, ValueError)
+
+class QueueFull(Exception):
+    pass
+
+class WriteBehindQueue:
+    # Bounded in-memory buffer in front of the events table. Request handlers
+    # call submit() and return immediately; one background thread group-commits
+    # whatever is pending every `flush_interval` seconds or as soon as
+    # `flush_batch` rows are waiting, whichever comes first.
+    # flush_fn(rows) returns how many rows it inserted (replayed idempotency
+    # keys are skipped, not inserted). A batch rejected for its data
+    # (BAD_ROWS) is retried row by row so only the offending rows are lost.
+
+    def __init__(self, flush_fn, max_size=10000, flush_interval=0.05, flush_batch=500, max_retries=3):
+        self.flush_fn = flush_fn
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.max_retries = max_retries
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.last_flush_seconds = 0.0
+
+    def _ensure_started(self):
+        # threads do not survive fork(), so start the writer inside each worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="event-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        # all-or-nothing, so a batch is never half accepted
+        with self._cond:
+            self._ensure_started()
+            if len(self._pending) + len(rows) > self.max_size:
+                self.rejected += len(rows)
+                raise QueueFull(f"write-behind queue full ({len(self._pending)}/{self.max_size})")
+            self._pending.extend(rows)
+            self.enqueued += len(rows)
+            if len(self._pending) >= self.flush_batch:
+                self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            if not self._stopping and len(self._pending) < self.flush_batch:
+                self._cond.wait(self.flush_interval)
+            n = min(len(self._pending), self.flush_batch)
+            return [self._pending.popleft() for _ in range(n)]
+
+    def _write(self, rows):
+        # -> rows inserted, or None once max_retries attempts have failed;
+        # BAD_ROWS are raised at once
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return self.flush_fn(rows)
+            except BAD_ROWS:
+                raise
+            except Exception:
+                log.exception("write-behind flush of %d rows failed (attempt %d)", len(rows), attempt)
+                time.sleep(self.flush_interval * attempt)
+        self.dropped += len(rows)
+        log.error("write-behind dropped %d rows after %d attempts", len(rows), self.max_retries)
+        return None
+
+    def _write_each(self, rows):
+        # one bad row must not sink the rest of its batch
+        inserted = 0
+        for row in rows:
+            try:
+                inserted += self._write([row]) or 0
+            except BAD_ROWS:
+                self.dropped += 1
+                log.exception("write-behind dropped a row it could not insert: %r", row)
+        return inserted
+
+    def _flush(self, rows):
+        started = time.perf_counter()
+        rejected = False
+        try:
+            inserted = self._write(rows)
+        except BAD_ROWS:
+            log.warning("write-behind batch of %d rows rejected, retrying row by row", len(rows), exc_info=True)
+            rejected = True
+        if rejected:
+            inserted = self._write_each(rows)
+        if inserted is None:
+            return
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self.flushed += inserted
+        self.last_flush_seconds = elapsed
+        self.flush_seconds_total += elapsed
+        self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+
+    def _run(self):
+        while True:
+            rows = self._take()
+            if rows:
+                self._flush(rows)
+            elif self._stopping:
+                return
+
+    def stop(self, timeout=10.0):
+        # flush-on-shutdown: the writer drains everything before exiting
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def depth(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+            "max_flush_ms": round(self.flush_seconds_max * 1000, 2),
+            "avg_flush_ms": round(self.flush_seconds_total * 1000 / self.flushes, 2) if self.flushes else 0.0,
+        }